@@ -1,48 +1,101 @@
-from openai import OpenAI
-import os
-import edge_tts
-import json
-import asyncio
-import whisper_timestamped as whisper
-from utility.script.script_generator import generate_script
-from utility.audio.audio_generator import generate_audio
-from utility.captions.timed_captions_generator import generate_timed_captions
-from utility.video.background_video_generator import generate_video_url
-from utility.render.render_engine import get_output_media
-from utility.video.video_search_query_generator import getVideoSearchQueriesTimed, merge_empty_intervals
 import argparse
+import asyncio
+import os
+import tempfile
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Generate a video from a topic.")
-    parser.add_argument("topic", type=str, help="The topic for the video")
+def run_pipeline(topic, single_call=False, captions_from="whisper", on_event=None,
+                 audio_file=None, video_server="pexel"):
+    """Generate a video for topic and return (video_path, trace).
 
-    args = parser.parse_args()
-    SAMPLE_TOPIC = args.topic
-    SAMPLE_FILE_NAME = "audio_tts.wav"
-    VIDEO_SERVER = "pexel"
+    captions_from="tts" builds the captions from the TTS word timings instead of
+    running Whisper, when the TTS backend provides them. Without audio_file the
+    narration goes to a temporary file of this job that is deleted afterwards.
+    """
+    # Pipeline stages are imported here so --help stays fast
+    from utility.script.script_generator import generate_script, generate_script_with_keywords
+    from utility.audio.audio_generator import generate_audio
+    from utility.captions.timed_captions_generator import generate_timed_captions, getCaptionsFromWords
+    from utility.video.background_video_generator import generate_video_url
+    from utility.render.render_engine import get_output_media
+    from utility.video.video_search_query_generator import iterVideoSearchQueriesTimed, mapKeywordsToCaptions, merge_empty_intervals
+    from utility.progress import stage
+    from utility.tracing import start_trace
+
+    temporary_audio = audio_file is None
+    if temporary_audio:
+        # Jobs share the caption service, so each one needs its own narration file
+        audio_fd, audio_file = tempfile.mkstemp(prefix="audio_tts_", suffix=".wav")
+        os.close(audio_fd)
 
-    response = generate_script(SAMPLE_TOPIC)
-    print("script: {}".format(response))
+    video = None
+    with start_trace() as trace:
+        try:
+            sentences = None
+            with stage(on_event, "script"):
+                if single_call:
+                    response, sentences = generate_script_with_keywords(topic)
+                else:
+                    response = generate_script(topic)
+            print("script: {}".format(response))
 
-    asyncio.run(generate_audio(response, SAMPLE_FILE_NAME))
+            with stage(on_event, "audio"):
+                words = asyncio.run(generate_audio(response, audio_file, on_event=on_event))
 
-    timed_captions = generate_timed_captions(SAMPLE_FILE_NAME)
-    print(timed_captions)
+            with stage(on_event, "captions"):
+                if captions_from == "tts" and words:
+                    timed_captions = getCaptionsFromWords(words)
+                else:
+                    timed_captions = generate_timed_captions(audio_file, on_event=on_event)
+            print(timed_captions)
 
-    search_terms = getVideoSearchQueriesTimed(response, timed_captions)
-    print(search_terms)
+            if sentences:
+                search_terms = mapKeywordsToCaptions(sentences, timed_captions)
+                print(search_terms)
+            else:
+                # Footage search starts on the first streamed segment
+                search_terms = iterVideoSearchQueriesTimed(response, timed_captions)
 
-    background_video_urls = None
-    if search_terms is not None:
-        background_video_urls = generate_video_url(search_terms, VIDEO_SERVER)
-        print(background_video_urls)
-    else:
-        print("No background video")
+            background_video_urls = None
+            if search_terms is not None:
+                # With streamed keywords this stage also covers the keyword generation
+                with stage(on_event, "footage"):
+                    background_video_urls = generate_video_url(search_terms, video_server, on_event=on_event)
+                print(background_video_urls)
+            if not background_video_urls:
+                # Streamed keywords are a generator, so an empty result only shows up here
+                print("No background video")
+                background_video_urls = None
+            else:
+                background_video_urls = merge_empty_intervals(background_video_urls)
+
+            if background_video_urls:
+                with stage(on_event, "render"):
+                    video = get_output_media(audio_file, timed_captions, background_video_urls, video_server,
+                                             on_event=on_event)
+                print(video)
+            else:
+                print("No video")
+        finally:
+            if temporary_audio and os.path.exists(audio_file):
+                os.remove(audio_file)
+            print("trace: {}".format(trace.write()))
+
+    return video, trace
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a video from a topic.")
+    parser.add_argument("topic", type=str, help="The topic for the video")
+    parser.add_argument("--quiet", action="store_true", help="Do not print stage and render progress")
+    parser.add_argument("--single-call", action="store_true",
+                        help="Generate the script and search keywords in one LLM call and map keywords to captions locally")
+    parser.add_argument("--captions-from", choices=["whisper", "tts"], default="whisper",
+                        help="Caption timing source; 'tts' uses the TTS word timings and skips Whisper")
+    parser.add_argument("--video-server", default="pexel",
+                        help="Footage provider: 'pexel' (Pexels API) or 'local' (FOOTAGE_LIBRARY_DIR folder)")
+
+    args = parser.parse_args()
 
-    background_video_urls = merge_empty_intervals(background_video_urls)
+    from utility.progress import print_sink
 
-    if background_video_urls is not None:
-        video = get_output_media(SAMPLE_FILE_NAME, timed_captions, background_video_urls, VIDEO_SERVER)
-        print(video)
-    else:
-        print("No video")
+    run_pipeline(args.topic, single_call=args.single_call, captions_from=args.captions_from,
+                 on_event=None if args.quiet else print_sink, video_server=args.video_server)
@@ -0,0 +1,156 @@
+"""Whisper caption benchmark: default path vs the WHISPER_FAST path.
+
+Every audio file of the corpus is transcribed by the current path (float32,
+full audio) and by the fast path (int8 weights, VAD-trimmed audio), both with
+the same decoding options:
+
+    python -m benchmarks.caption_bench
+    python -m benchmarks.caption_bench --corpus narration1.mp3 narration2.wav --model small --json captions.json
+
+Without --corpus a fixed corpus is synthesized once with the configured TTS
+backend (Edge by default, so the first run needs network) and cached; pauses
+are inserted between sentences so the VAD has silence to cut. Reported per
+file: transcription seconds for both paths (best of --repeat, model already
+loaded), speedup, the share of baseline words the fast path reproduces and the
+drift of their end timestamps.
+"""
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CORPUS_SCRIPTS = [
+    ["Octopuses have three hearts and blue blood.",
+     "Two hearts pump blood to the gills, while the third pumps it to the rest of the body.",
+     "When an octopus swims, the heart that feeds the body actually stops beating."],
+    ["Honey never spoils.",
+     "Archaeologists have found pots of honey in ancient Egyptian tombs that are over three thousand years old.",
+     "Its low moisture and high acidity make it a hostile place for bacteria.",
+     "Bees add an enzyme that produces small amounts of hydrogen peroxide."],
+    ["A day on Venus is longer than its year.",
+     "Venus spins so slowly that one rotation takes two hundred and forty three Earth days.",
+     "It orbits the Sun in only two hundred and twenty five days.",
+     "It also spins backwards, so the Sun rises in the west."],
+]
+# Silence inserted between corpus sentences, in seconds
+CORPUS_PAUSES = [0.4, 1.2, 2.5]
+SAMPLE_RATE = 16000
+
+
+def synthesize_corpus(directory):
+    """WAV files of CORPUS_SCRIPTS with pauses between sentences, synthesized on first use"""
+    import numpy as np
+    import whisper
+    from utility.audio.audio_generator import generate_audio
+
+    paths = []
+    for index, sentences in enumerate(CORPUS_SCRIPTS):
+        path = os.path.join(directory, "corpus_{}.wav".format(index))
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        pieces = [np.zeros(int(SAMPLE_RATE * 0.8), dtype=np.float32)]
+        for number, sentence in enumerate(sentences):
+            sentence_file = os.path.join(directory, "sentence.audio")
+            asyncio.run(generate_audio(sentence, sentence_file))
+            pieces.append(whisper.load_audio(sentence_file))
+            pieces.append(np.zeros(int(SAMPLE_RATE * CORPUS_PAUSES[number % len(CORPUS_PAUSES)]), dtype=np.float32))
+        samples = (np.clip(np.concatenate(pieces), -1, 1) * 32767).astype(np.int16)
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(samples.tobytes())
+    return paths
+
+
+def words_of(analysis):
+    return [(re.sub(r"[^\w']", "", word["text"].lower()), word["end"])
+            for segment in analysis["segments"] for word in segment.get("words", [])]
+
+
+def timing_drift(baseline, fast):
+    """(share of baseline words matched, mean and max |end drift| in seconds over matched words)"""
+    baseline_words, fast_words = words_of(baseline), words_of(fast)
+    matcher = difflib.SequenceMatcher(a=[text for text, _ in baseline_words], b=[text for text, _ in fast_words],
+                                      autojunk=False)
+    drifts = [abs(baseline_words[block.a + offset][1] - fast_words[block.b + offset][1])
+              for block in matcher.get_matching_blocks() for offset in range(block.size)]
+    matched = len(drifts) / len(baseline_words) if baseline_words else 1.0
+    return matched, (sum(drifts) / len(drifts) if drifts else 0.0), max(drifts, default=0.0)
+
+
+def best_time(function, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper caption benchmark: default vs fast path.")
+    parser.add_argument("--corpus", nargs="*", help="Audio files (default: synthesized corpus)")
+    parser.add_argument("--model", default="base", help="Whisper model size")
+    parser.add_argument("--repeat", type=int, default=2, help="Runs per file and path; the fastest counts")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import torch
+    import whisper
+    from utility.captions.caption_service import WHISPER_THREADS, load_whisper_model, run_transcription
+
+    torch.set_num_threads(WHISPER_THREADS)
+    corpus = args.corpus
+    if not corpus:
+        directory = os.path.join(tempfile.gettempdir(), "text_to_video_caption_corpus")
+        os.makedirs(directory, exist_ok=True)
+        corpus = synthesize_corpus(directory)
+
+    load_seconds = {}
+    models = {}
+    for fast in (False, True):
+        started = time.perf_counter()
+        models[fast] = load_whisper_model(args.model, fast)
+        load_seconds[fast] = time.perf_counter() - started
+    print("model load s: default {:.2f}, fast {:.2f}".format(load_seconds[False], load_seconds[True]))
+
+    results = []
+    header = ["file", "audio s", "default s", "fast s", "speedup", "trimmed s", "words", "drift ms", "max ms"]
+    print(" | ".join("{:>10}".format(column) for column in header))
+    for path in corpus:
+        baseline_seconds, baseline = best_time(lambda: run_transcription(models[False], path), args.repeat)
+        fast_seconds, fast = best_time(lambda: run_transcription(models[True], path, fast=True), args.repeat)
+        matched, mean_drift, max_drift = timing_drift(baseline, fast)
+        audio_seconds = len(whisper.load_audio(path)) / SAMPLE_RATE
+        result = {"file": path, "audio_seconds": audio_seconds, "default_seconds": baseline_seconds,
+                  "fast_seconds": fast_seconds, "speedup": baseline_seconds / fast_seconds,
+                  "trimmed_seconds": fast.get("trimmed_seconds", 0), "words_matched": matched,
+                  "mean_drift_seconds": mean_drift, "max_drift_seconds": max_drift}
+        results.append(result)
+        print(" | ".join("{:>10}".format(column) for column in [
+            os.path.basename(path)[:10], "{:.1f}".format(audio_seconds), "{:.2f}".format(baseline_seconds),
+            "{:.2f}".format(fast_seconds), "{:.2f}x".format(result["speedup"]),
+            "{:.1f}".format(result["trimmed_seconds"]), "{:.0%}".format(matched),
+            "{:.0f}".format(mean_drift * 1000), "{:.0f}".format(max_drift * 1000)]))
+
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump({"model": args.model, "load_seconds": {"default": load_seconds[False],
+                                                             "fast": load_seconds[True]},
+                       "results": results}, outfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
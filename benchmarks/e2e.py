@@ -0,0 +1,146 @@
+"""Offline end-to-end benchmark of the app.py pipeline.
+
+Every external service is replaced by a local stand-in from
+benchmarks.fake_services (chat completions, TTS, Pexels search and clip
+downloads), so runs cost no API quota and are repeatable. Each script size runs
+in its own interpreter so peak RSS is measured per run:
+
+    python -m benchmarks.e2e
+    python -m benchmarks.e2e --sizes small --repeat 3 --json results.json
+
+Captions come from the fake TTS word timings by default because the fake audio
+is tones, not speech; --captions whisper still exercises the Whisper stage.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script sentences per benchmark size
+SIZES = {"small": 4, "medium": 10, "long": 24}
+
+STAGES = ["script", "audio", "captions", "footage", "render"]
+
+
+def run_one(single_call, captions_from):
+    """Run the pipeline once in this interpreter and return its metrics"""
+    sys.path.insert(0, ROOT)
+    from benchmarks.fake_services import register_fake_tts
+    from app import run_pipeline
+
+    register_fake_tts()
+    started = time.perf_counter()
+    video, trace = run_pipeline("Weird facts you don't know", single_call=single_call, captions_from=captions_from)
+    wall = time.perf_counter() - started
+
+    encode = next((record for record in trace.spans if record["name"] == "render.encode"), None)
+    encode_fps = None
+    output_seconds = None
+    if encode and encode["duration"]:
+        output_seconds = encode["attributes"]["duration"]
+        encode_fps = output_seconds * encode["attributes"]["fps"] / encode["duration"]
+
+    return {
+        "ok": video is not None,
+        "wall_seconds": wall,
+        "stages": trace.stage_durations(),
+        "output_seconds": output_seconds,
+        "encode_fps": encode_fps,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_child_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "counters": trace.to_dict()["counters"],
+    }
+
+
+def run_size(size, chat, pexels, single_call, captions_from):
+    """Run one size in a fresh interpreter and working directory"""
+    chat.sentences = SIZES[size]
+    requests_before = len(chat.requests)
+    bytes_before = pexels.bytes_served
+
+    workdir = tempfile.mkdtemp(prefix="bench_{}_".format(size))
+    output = os.path.join(workdir, "result.json")
+    env = dict(os.environ,
+               PYTHONPATH=ROOT,
+               OPENAI_BASE_URL=chat.base_url,
+               OPENAI_KEY="fake",
+               GROQ_API_KEY="",
+               PEXELS_API_URL=pexels.search_url,
+               PEXELS_KEY="fake",
+               TTS_BACKEND="fake")
+    command = [sys.executable, "-m", "benchmarks.e2e", "--run-one", "--output", output,
+               "--captions", captions_from] + (["--single-call"] if single_call else [])
+    with open(os.path.join(workdir, "pipeline.log"), "w") as log:
+        completed = subprocess.run(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if completed.returncode != 0 or not os.path.exists(output):
+        raise RuntimeError("{} run failed, see {}".format(size, os.path.join(workdir, "pipeline.log")))
+
+    with open(output) as infile:
+        result = json.load(infile)
+    llm_requests = chat.requests[requests_before:]
+    result.update({
+        "size": size,
+        "llm_requests": len(llm_requests),
+        "llm_prompt_chars": sum(request["prompt_chars"] for request in llm_requests),
+        "bytes_from_fake_pexels": pexels.bytes_served - bytes_before,
+        "workdir": workdir,
+    })
+    return result
+
+
+def print_report(results):
+    header = ["size", "wall s"] + [name + " s" for name in STAGES] + ["out s", "enc fps", "rss MB", "llm", "MB dl"]
+    print(" | ".join("{:>9}".format(column) for column in header))
+    for result in results:
+        row = [result["size"], "{:.2f}".format(result["wall_seconds"])]
+        row += ["{:.2f}".format(result["stages"].get(name, 0)) for name in STAGES]
+        row += [
+            "{:.1f}".format(result["output_seconds"] or 0),
+            "{:.1f}".format(result["encode_fps"] or 0),
+            "{:.0f}".format(max(result["peak_rss_mb"], result["peak_child_rss_mb"])),
+            str(result["llm_requests"]),
+            "{:.1f}".format(result["bytes_from_fake_pexels"] / 1e6),
+        ]
+        print(" | ".join("{:>9}".format(column) for column in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--single-call", action="store_true", help="Benchmark the single-call script mode")
+    parser.add_argument("--captions", choices=["tts", "whisper"], default="tts")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="Fake LLM seconds between streamed chunks")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        with open(args.output, "w") as outfile:
+            json.dump(run_one(args.single_call, args.captions), outfile)
+        return
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.fake_services import FakeChatServer, FakePexelsServer
+
+    clip_directory = os.path.join(tempfile.gettempdir(), "text_to_video_bench_clips")
+    results = []
+    with FakeChatServer(chunk_delay=args.chunk_delay) as chat, FakePexelsServer(clip_directory) as pexels:
+        for size in args.sizes:
+            for _ in range(args.repeat):
+                results.append(run_size(size, chat, pexels, args.single_call, args.captions))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+"""Local stand-ins for the external services used by the pipeline.
+
+FakeChatServer speaks the OpenAI chat completions API (plain and streamed
+server-sent events) well enough for the script and keyword prompts,
+fake_tts_synthesize is a TTS backend emitting deterministic audio with word
+timings, and FakePexelsServer answers video searches with links to synthetic
+clips it serves itself. Point the OpenAI client at the chat server with
+OPENAI_BASE_URL and leave GROQ_API_KEY unset:
+
+    python -m benchmarks.fake_services --port 8765
+    export OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_KEY=fake
+"""
+import argparse
+import array
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+import urllib.parse
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FACTS = [
+    "Bananas are berries, but strawberries are not.",
+    "A single cloud can weigh over a million pounds.",
+    "There is a species of jellyfish that is biologically immortal.",
+    "Honey never spoils, even after three thousand years in a tomb.",
+    "The shortest war in history lasted only thirty eight minutes.",
+    "Octopuses have three hearts and blue blood.",
+    "A day on Venus is longer than a year on Venus.",
+    "Sharks existed before trees appeared on Earth.",
+    "Wombats produce cube shaped droppings.",
+    "The Eiffel Tower grows taller in the summer heat.",
+    "Sea otters hold hands while they sleep.",
+    "Lightning strikes the Earth about eight million times a day.",
+]
+
+# ((t1, t2), 'text') tuples as produced by str() on the timed captions, with or without numpy reprs
+CAPTION_PATTERN = re.compile(
+    r"\(\((?:np\.float\d+\()?([\d.]+)\)?, (?:np\.float\d+\()?([\d.]+)\)?\), ['\"](.*?)['\"]\)")
+
+
+def fake_sentences(count):
+    """Deterministic script sentences, cycling through FACTS"""
+    return [FACTS[index % len(FACTS)] for index in range(count)]
+
+
+def fake_keywords(text):
+    """Three deterministic two-word keywords derived from a piece of text"""
+    words = [word for word in re.findall(r"[a-zA-Z]+", text.lower()) if len(word) > 3] or ["nature"]
+    keywords = []
+    for index in range(3):
+        keywords.append(" ".join(words[(index + offset) % len(words)] for offset in range(2)))
+    return keywords
+
+
+def fake_segments(user_content, segment_seconds=4.0):
+    """Group the timed captions in a keyword request into ~segment_seconds segments"""
+    captions = [(float(t1), float(t2), text) for t1, t2, text in CAPTION_PATTERN.findall(user_content)]
+    segments = []
+    start = 0.0
+    texts = []
+    for index, (_, t2, text) in enumerate(captions):
+        texts.append(text)
+        if t2 - start >= segment_seconds or index == len(captions) - 1:
+            segments.append({"start": start, "end": t2, "keywords": fake_keywords(" ".join(texts))})
+            start = t2
+            texts = []
+    return segments
+
+
+class LocalServer:
+    """Threaded HTTP server on a free local port, usable as a context manager"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def root_url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        raise NotImplementedError
+
+
+class FakeChatServer(LocalServer):
+    """OpenAI-compatible chat completions server with canned, deterministic answers.
+
+    json_schema=False rejects json_schema response formats with a 400 like
+    models without structured output do; legacy_layout=True answers keyword
+    requests with the [[[t1, t2], [...]], ...] list even in JSON mode.
+    """
+
+    def __init__(self, sentences=8, chunk_size=12, chunk_delay=0.01, latency=0.0, json_schema=True,
+                 legacy_layout=False, host="127.0.0.1", port=0):
+        self.sentences = sentences
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.latency = latency
+        self.json_schema = json_schema
+        self.legacy_layout = legacy_layout
+        self.requests = []
+        # Streamed responses sent completely, including the final [DONE]
+        self.finished_streams = 0
+        super().__init__(host, port)
+
+    @property
+    def base_url(self):
+        return self.root_url + "/v1"
+
+    def answer(self, body):
+        """Content of the assistant message for a chat completions request body"""
+        messages = body.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in messages if m["role"] == "user"), "")
+
+        if "Timed Captions:" in user:
+            segments = fake_segments(user)
+            if body.get("response_format") and not self.legacy_layout:
+                return json.dumps({"segments": segments})
+            return json.dumps([[[s["start"], s["end"]], s["keywords"]] for s in segments])
+
+        sentences = fake_sentences(self.sentences)
+        if '"keywords"' in system:
+            return json.dumps({"script": [{"text": text, "keywords": fake_keywords(text)} for text in sentences]})
+        return json.dumps({"script": " ".join(sentences)})
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                response_format = (body.get("response_format") or {}).get("type")
+                rejected = response_format == "json_schema" and not server.json_schema
+                content = "" if rejected else server.answer(body)
+                server.requests.append({
+                    "stream": bool(body.get("stream")),
+                    "response_format": response_format,
+                    "rejected": rejected,
+                    "prompt_chars": sum(len(m.get("content", "")) for m in body.get("messages", [])),
+                    "completion_chars": len(content),
+                })
+                if rejected:
+                    self._error(400, "response_format json_schema is not supported by this model")
+                    return
+                time.sleep(server.latency)
+                if body.get("stream"):
+                    self._stream(body, content)
+                else:
+                    self._respond(body, content)
+
+            def _error(self, status, message):
+                payload = json.dumps({"error": {"message": message, "type": "invalid_request_error"}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _respond(self, body, content):
+                payload = json.dumps({
+                    "id": "chatcmpl-" + uuid.uuid4().hex,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                completion_id = "chatcmpl-" + uuid.uuid4().hex
+                pieces = [{"role": "assistant", "content": ""}]
+                pieces += [{"content": content[i:i + server.chunk_size]}
+                            for i in range(0, len(content), server.chunk_size)]
+                for index, delta in enumerate(pieces + [None]):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "delta": delta or {},
+                                     "finish_reason": None if delta is not None else "stop"}],
+                    }
+                    self.wfile.write("data: {}\n\n".format(json.dumps(chunk)).encode())
+                    self.wfile.flush()
+                    if index:
+                        time.sleep(server.chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                server.finished_streams += 1
+                self.close_connection = True
+
+        return Handler
+
+
+# Fake TTS: 16-bit mono PCM WAV, one deterministic tone per word
+TTS_SAMPLE_RATE = 16000
+TTS_SECONDS_PER_CHAR = 0.06
+TTS_WORD_GAP = 0.08
+
+
+def fake_tts_audio(text):
+    """Return (wav_bytes, words) for text; word timings match the generated audio"""
+    samples = array.array("h")
+    words = []
+    position = 0.0
+    for word in text.split():
+        duration = 0.1 + TTS_SECONDS_PER_CHAR * len(word)
+        frequency = 200 + sum(map(ord, word)) % 600
+        count = int(duration * TTS_SAMPLE_RATE)
+        samples.extend(int(8000 * math.sin(2 * math.pi * frequency * i / TTS_SAMPLE_RATE)) for i in range(count))
+        samples.extend([0] * int(TTS_WORD_GAP * TTS_SAMPLE_RATE))
+        words.append({"text": word, "start": position, "end": position + duration})
+        position += duration + TTS_WORD_GAP
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(TTS_SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue(), words
+
+
+async def fake_tts_synthesize(text, voice):
+    return fake_tts_audio(text)
+
+
+def register_fake_tts(name="fake"):
+    """Register the fake TTS as a backend of utility.audio.audio_generator"""
+    from utility.audio.audio_generator import register_tts_backend
+
+    register_tts_backend(name, fake_tts_synthesize)
+    return name
+
+
+def make_clip(path, seconds=10, width=1920, height=1080, fps=25, pattern="testsrc2", faststart=True):
+    """Encode a synthetic H.264 clip with ffmpeg's lavfi sources (testsrc2, color, noise...).
+
+    faststart=False leaves the moov atom at the end of the file, as some uploads have it.
+    """
+    from utility.video.footage_providers import ffmpeg_binary
+
+    if pattern == "noise":
+        source = "nullsrc=size={}x{}:rate={}:duration={},geq=random(1)*255:128:128".format(width, height, fps, seconds)
+    elif pattern.startswith("color"):
+        source = "color=c={}:size={}x{}:rate={}:duration={}".format(
+            pattern.partition(":")[2] or "blue", width, height, fps, seconds)
+    else:
+        source = "{}=size={}x{}:rate={}:duration={}".format(pattern, width, height, fps, seconds)
+    subprocess.run([ffmpeg_binary(), "-y", "-loglevel", "error", "-f", "lavfi", "-i", source,
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+                   + (["-movflags", "+faststart"] if faststart else []) + [path], check=True)
+    return path
+
+
+class FakePexelsServer(LocalServer):
+    """Pexels video search API plus the clip files its results link to.
+
+    Every query returns videos_per_query deterministic results with 1080p, 720p
+    and 540p renditions. All links point at /clips/<video id>.hd.mp4 on this
+    server and are backed by a small pool of synthetic clips in clip_directory.
+    Clips honour HTTP Range requests unless range_requests is False, and
+    faststart=False serves clips with the moov atom at the end.
+    bytes_served counts the bytes actually written, so aborted transfers only
+    count what was sent.
+    """
+
+    def __init__(self, clip_directory, videos_per_query=15, clip_pool=3, clip_seconds=8, host="127.0.0.1", port=0,
+                 range_requests=True, faststart=True):
+        self.clip_directory = clip_directory
+        self.videos_per_query = videos_per_query
+        self.clip_seconds = clip_seconds
+        self.range_requests = range_requests
+        self.faststart = faststart
+        self.searches = []
+        self.bytes_served = 0
+        self._clips = []
+        self._lock = threading.Lock()
+        self._clip_pool = clip_pool
+        super().__init__(host, port)
+
+    @property
+    def search_url(self):
+        return self.root_url + "/videos/search"
+
+    def prepare_clips(self):
+        """Encode the clip pool once; links are spread across it by video id"""
+        os.makedirs(self.clip_directory, exist_ok=True)
+        patterns = ["testsrc2", "color:navy", "noise"]
+        for index in range(self._clip_pool):
+            path = os.path.join(self.clip_directory, "clip_{}_{}s{}.mp4".format(
+                index, self.clip_seconds, "" if self.faststart else "_moov_last"))
+            if not os.path.exists(path):
+                make_clip(path, seconds=self.clip_seconds, pattern=patterns[index % len(patterns)],
+                          faststart=self.faststart)
+            self._clips.append(path)
+        return self
+
+    def start(self):
+        if not self._clips:
+            self.prepare_clips()
+        return super().start()
+
+    def search(self, query, orientation="landscape"):
+        """Response body for a search, shaped like the real Pexels API"""
+        seed = int(hashlib.md5(query.encode()).hexdigest()[:6], 16)
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")
+        landscape = orientation != "portrait"
+        videos = []
+        for index in range(self.videos_per_query):
+            video_id = seed * 100 + index
+            renditions = []
+            for quality, (width, height) in (("hd", (1920, 1080)), ("hd", (1280, 720)), ("sd", (960, 540))):
+                if not landscape:
+                    width, height = height, width
+                renditions.append({
+                    "id": video_id * 10 + len(renditions),
+                    "quality": quality,
+                    "file_type": "video/mp4",
+                    "width": width,
+                    "height": height,
+                    "fps": 25,
+                    "link": "{}/clips/{}.{}.mp4?w={}".format(self.root_url, video_id, quality, width),
+                })
+            videos.append({
+                "id": video_id,
+                "width": renditions[0]["width"],
+                "height": renditions[0]["height"],
+                "duration": 5 + (seed + index * 7) % 25,
+                "url": "https://www.pexels.com/video/{}-{}/".format(slug, video_id),
+                "image": "",
+                "video_files": renditions,
+            })
+        return {"page": 1, "per_page": self.videos_per_query, "total_results": len(videos), "videos": videos}
+
+    def clip_path(self, video_id):
+        return self._clips[video_id % len(self._clips)]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                if url.path == "/videos/search":
+                    params = urllib.parse.parse_qs(url.query)
+                    query = params.get("query", [""])[0]
+                    server.searches.append(query)
+                    payload = json.dumps(server.search(query, params.get("orientation", ["landscape"])[0])).encode()
+                    self._send(200, "application/json", payload)
+                elif url.path.startswith("/clips/"):
+                    video_id = int(url.path.split("/")[-1].split(".")[0])
+                    self._send_clip(server.clip_path(video_id))
+                else:
+                    self.send_error(404)
+
+            def _send_clip(self, path):
+                from utility.render.artifact_store import parse_range
+
+                size = os.path.getsize(path)
+                byte_range = None
+                if server.range_requests:
+                    try:
+                        byte_range = parse_range(self.headers.get("Range"), size)
+                    except ValueError:
+                        self.send_response(416)
+                        self.send_header("Content-Range", "bytes */{}".format(size))
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                start, end = byte_range or (0, size - 1)
+                self.send_response(206 if byte_range else 200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(end - start + 1))
+                if server.range_requests:
+                    self.send_header("Accept-Ranges", "bytes")
+                if byte_range:
+                    self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, size))
+                self.end_headers()
+                with open(path, "rb") as clip:
+                    clip.seek(start)
+                    remaining = end - start + 1
+                    try:
+                        while remaining > 0:
+                            chunk = clip.read(min(64 * 1024, remaining))
+                            self.wfile.write(chunk)
+                            remaining -= len(chunk)
+                            with server._lock:
+                                server.bytes_served += len(chunk)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass  # ffmpeg hangs up once it has read the window it needs
+
+            def _send(self, status, content_type, payload):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with server._lock:
+                    server.bytes_served += len(payload)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI-compatible chat server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sentences", type=int, default=8, help="Sentences in the generated script")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="Seconds between streamed chunks")
+    args = parser.parse_args()
+
+    chat = FakeChatServer(sentences=args.sentences, chunk_delay=args.chunk_delay, port=args.port).start()
+    print("Fake chat server on {} (export OPENAI_BASE_URL={} OPENAI_KEY=fake)".format(chat.base_url, chat.base_url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        chat.stop()
@@ -0,0 +1,76 @@
+"""Bytes transferred per background clip: full download vs trimmed fetch.
+
+A local range-capable clip server (benchmarks.fake_services.FakePexelsServer)
+serves synthetic 1080p clips; every clip is fetched the way get_output_media
+does it, once as a whole-file download and once through the trimmed fetch for
+several segment lengths. The server counts the bytes it actually sends.
+Servers without Range support and clips with the moov atom at the end are
+included to check the fallback:
+
+    python -m benchmarks.fetch_bench
+    python -m benchmarks.fetch_bench --clip-seconds 60 --segments 3 5 --json fetch.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, range_requests, faststart) of each clip server
+SERVERS = [("range+faststart", True, True), ("range+moov_last", True, False), ("no_range", False, True)]
+
+
+def fetch(provider, server, url, seconds):
+    """(bytes served, seconds, local file bytes) for one fetch"""
+    before = server.bytes_served
+    started = time.perf_counter()
+    path, is_temporary = provider.fetch(url, seconds=seconds)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(path)
+    if is_temporary:
+        os.remove(path)
+    return server.bytes_served - before, elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full download vs trimmed fetch of background clips.")
+    parser.add_argument("--clip-seconds", type=int, default=30, help="Length of the served clips")
+    parser.add_argument("--segments", nargs="+", type=float, default=[3, 5, 8], help="Segment lengths in seconds")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.fake_services import FakePexelsServer
+    from utility.video.footage_providers import FootageProvider
+
+    provider = FootageProvider()
+    clip_directory = os.path.join(tempfile.gettempdir(), "text_to_video_fetch_bench_clips")
+    results = []
+    header = ["server", "segment s", "full MB", "fetched MB", "saved", "full s", "fetch s", "file MB"]
+    print(" | ".join("{:>15}".format(column) for column in header))
+    for label, range_requests, faststart in SERVERS:
+        with FakePexelsServer(clip_directory, clip_pool=1, clip_seconds=args.clip_seconds,
+                              range_requests=range_requests, faststart=faststart) as server:
+            url = server.search("benchmark")["videos"][0]["video_files"][0]["link"]
+            full_bytes, full_seconds, _ = fetch(provider, server, url, None)
+            for seconds in args.segments:
+                fetched_bytes, fetch_seconds, file_bytes = fetch(provider, server, url, seconds)
+                result = {"server": label, "segment_seconds": seconds, "clip_seconds": args.clip_seconds,
+                          "full_bytes": full_bytes, "fetched_bytes": fetched_bytes,
+                          "full_seconds": full_seconds, "fetch_seconds": fetch_seconds, "file_bytes": file_bytes}
+                results.append(result)
+                print(" | ".join("{:>15}".format(column) for column in [
+                    label, "{:.0f}".format(seconds), "{:.2f}".format(full_bytes / 1e6),
+                    "{:.2f}".format(fetched_bytes / 1e6), "{:.0%}".format(1 - fetched_bytes / full_bytes),
+                    "{:.2f}".format(full_seconds), "{:.2f}".format(fetch_seconds), "{:.2f}".format(file_bytes / 1e6)]))
+
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
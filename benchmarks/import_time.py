@@ -0,0 +1,103 @@
+"""Import-time regression check based on `python -X importtime`.
+
+Each pipeline module is imported in a fresh interpreter. The check fails when a
+module pulls in one of the HEAVY_MODULES at import time or exceeds its budget,
+and `python app.py --help` is timed end to end:
+
+    python -m benchmarks.import_time
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported by the stage that uses them
+HEAVY_MODULES = ["torch", "whisper_timestamped", "moviepy", "streamlit", "openai", "groq", "edge_tts"]
+
+# Cumulative import budget per module in milliseconds, generous enough for slow CI machines
+IMPORT_BUDGETS_MS = {
+    "utility.utils": 150,
+    "utility.script.script_generator": 150,
+    "utility.video.video_search_query_generator": 150,
+    "utility.video.background_video_generator": 400,
+    "utility.audio.audio_generator": 150,
+    "utility.captions.timed_captions_generator": 150,
+    "utility.render.render_engine": 400,
+}
+
+HELP_BUDGET_MS = 500
+
+
+def measure_import(module):
+    """Return (cumulative_ms, imported_module_names) for importing module in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError("import {} failed:\n{}".format(module, result.stderr[-2000:]))
+
+    cumulative_us = 0
+    imported = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        imported.append(name.strip())
+        if name.strip() == module:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, imported
+
+
+def heavy_imports(imported):
+    """HEAVY_MODULES among the imported module names"""
+    return sorted({name.split(".")[0] for name in imported} & set(HEAVY_MODULES))
+
+
+def measure_help():
+    """Wall time in milliseconds of `python app.py --help`"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "app.py", "--help"], cwd=ROOT, capture_output=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(modules=None):
+    """Print a report and return the list of failures"""
+    failures = []
+    for module in modules or IMPORT_BUDGETS_MS:
+        try:
+            elapsed_ms, imported = measure_import(module)
+        except RuntimeError as e:
+            failures.append(str(e))
+            print("{:<50} FAILED".format(module))
+            continue
+        heavy = heavy_imports(imported)
+        budget = IMPORT_BUDGETS_MS.get(module)
+        print("{:<50} {:8.1f} ms  (budget {} ms){}".format(
+            module, elapsed_ms, budget, "  heavy: " + ", ".join(heavy) if heavy else ""))
+        if heavy:
+            failures.append("{} imports {} at import time".format(module, ", ".join(heavy)))
+        if budget is not None and elapsed_ms > budget:
+            failures.append("{} took {:.1f} ms to import (budget {} ms)".format(module, elapsed_ms, budget))
+
+    help_ms = measure_help()
+    print("{:<50} {:8.1f} ms  (budget {} ms)".format("python app.py --help", help_ms, HELP_BUDGET_MS))
+    if help_ms > HELP_BUDGET_MS:
+        failures.append("app.py --help took {:.1f} ms (budget {} ms)".format(help_ms, HELP_BUDGET_MS))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check pipeline import times.")
+    parser.add_argument("modules", nargs="*", help="Modules to check (default: all pipeline modules)")
+    args = parser.parse_args()
+
+    failures = run(args.modules)
+    for failure in failures:
+        print("❌ " + failure)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,167 @@
+"""Render-engine micro-benchmarks on synthetic timelines.
+
+Synthetic clips (ffmpeg lavfi noise/colour/test patterns), a silent narration
+track and evenly spaced captions are generated locally, then every point of the
+parameter grid is rendered by each backend in utility.render.render_engine
+RENDER_BACKENDS, one fresh interpreter per point so peak RSS is per render:
+
+    python -m benchmarks.render_bench
+    python -m benchmarks.render_bench --captions 0 40 --segments 1 12 --resolutions 720 1080 \\
+        --presets ultrafast veryfast --duration 20 --json render.json
+
+Reported per point: render seconds per output second, encoder fps (output
+frames / encode seconds), caption-build seconds and peak RSS.
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Source clip patterns cycled across segments
+PATTERNS = ["noise", "testsrc2", "color:navy"]
+
+
+def make_silence(path, seconds, sample_rate=16000):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\0\0" * int(seconds * sample_rate))
+    return path
+
+
+def make_timeline(duration, captions, segments):
+    """Evenly spaced captions and background segments covering [0, duration]"""
+    caption_length = duration / captions if captions else 0
+    timed_captions = [((round(i * caption_length, 3), round((i + 1) * caption_length, 3)), "caption {}".format(i))
+                      for i in range(captions)]
+    segment_length = duration / segments
+    background = [[round(i * segment_length, 3), round((i + 1) * segment_length, 3)] for i in range(segments)]
+    return timed_captions, background
+
+
+def clip_for(cache_directory, height, index, seconds):
+    """Path of a cached synthetic source clip, encoding it on first use"""
+    from benchmarks.fake_services import make_clip
+
+    width = height * 16 // 9
+    pattern = PATTERNS[index % len(PATTERNS)]
+    path = os.path.join(cache_directory, "{}_{}p_{}s.mp4".format(pattern.replace(":", "_"), height, seconds))
+    if not os.path.exists(path):
+        make_clip(path, seconds=seconds, width=width, height=height, pattern=pattern)
+    return path
+
+
+def run_point(point, cache_directory):
+    """Render one grid point in this interpreter and return its metrics"""
+    sys.path.insert(0, ROOT)
+    from utility.render.render_engine import RENDER_BACKENDS, build_caption_clips, configure_imagemagick
+    from utility.tracing import start_trace
+
+    configure_imagemagick()
+    workdir = tempfile.mkdtemp(prefix="render_bench_")
+    duration = point["duration"]
+    timed_captions, background = make_timeline(duration, point["captions"], point["segments"])
+    clip_seconds = int(duration / point["segments"]) + 2
+    background_clips = [((t1, t2), clip_for(cache_directory, point["resolution"], index, clip_seconds))
+                        for index, (t1, t2) in enumerate(background)]
+    audio = make_silence(os.path.join(workdir, "narration.wav"), duration)
+    output = os.path.join(workdir, "out.mp4")
+
+    started = time.perf_counter()
+    build_caption_clips(timed_captions)
+    caption_seconds = time.perf_counter() - started
+
+    with start_trace() as trace:
+        started = time.perf_counter()
+        RENDER_BACKENDS[point["backend"]](audio, timed_captions, background_clips, output,
+                                          point["fps"], point["preset"], None)
+        render_seconds = time.perf_counter() - started
+
+    encode = next((record for record in trace.spans if record["name"] == "render.encode"), None)
+    encode_seconds = encode["duration"] if encode else render_seconds
+    return dict(point,
+                render_seconds=render_seconds,
+                render_seconds_per_output_second=render_seconds / duration,
+                encoder_fps=duration * point["fps"] / encode_seconds,
+                caption_build_seconds=caption_seconds,
+                output_bytes=os.path.getsize(output),
+                peak_rss_mb=max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024)
+
+
+def grid(args):
+    from utility.render.render_engine import RENDER_BACKENDS
+
+    backends = args.backends or sorted(RENDER_BACKENDS)
+    for backend, captions, segments, resolution, preset in itertools.product(
+            backends, args.captions, args.segments, args.resolutions, args.presets):
+        yield {"backend": backend, "captions": captions, "segments": segments, "resolution": resolution,
+               "preset": preset, "duration": args.duration, "fps": args.fps}
+
+
+REPORT_COLUMNS = [
+    ("backend", "backend"), ("captions", "caps"), ("segments", "segs"), ("resolution", "res"), ("preset", "preset"),
+    ("render_seconds_per_output_second", "s/out s"), ("encoder_fps", "enc fps"),
+    ("caption_build_seconds", "caps s"), ("peak_rss_mb", "rss MB"),
+]
+
+
+def print_header():
+    print(" | ".join("{:>10}".format(title) for _, title in REPORT_COLUMNS))
+
+
+def print_row(result):
+    print(" | ".join("{:>10}".format(
+        "{:.2f}".format(result[column]) if isinstance(result[column], float) else str(result[column]))
+        for column, _ in REPORT_COLUMNS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render-engine micro-benchmarks.")
+    parser.add_argument("--backends", nargs="*", help="Render backends (default: all registered)")
+    parser.add_argument("--captions", nargs="+", type=int, default=[0, 30], help="Number of captions")
+    parser.add_argument("--segments", nargs="+", type=int, default=[1, 8], help="Number of background segments")
+    parser.add_argument("--resolutions", nargs="+", type=int, default=[720, 1080], help="Source clip heights")
+    parser.add_argument("--presets", nargs="+", default=["ultrafast", "veryfast"], help="x264 presets")
+    parser.add_argument("--duration", type=float, default=10, help="Output seconds per render")
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--run-point", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    cache_directory = os.path.join(tempfile.gettempdir(), "text_to_video_render_bench")
+    os.makedirs(cache_directory, exist_ok=True)
+
+    if args.run_point:
+        with open(args.output, "w") as outfile:
+            json.dump(run_point(json.loads(args.run_point), cache_directory), outfile)
+        return
+
+    sys.path.insert(0, ROOT)
+    results = []
+    print_header()
+    for point in grid(args):
+        output = tempfile.NamedTemporaryFile(delete=False, suffix=".json").name
+        subprocess.run([sys.executable, "-m", "benchmarks.render_bench", "--run-point", json.dumps(point),
+                        "--output", output], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(output) as infile:
+            results.append(json.load(infile))
+        os.remove(output)
+        print_row(results[-1])
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+
+if __name__ == "__main__":
+    main()
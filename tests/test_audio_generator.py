@@ -0,0 +1,71 @@
+"""Chunked TTS with the fake backend from benchmarks.fake_services"""
+import asyncio
+import os
+import wave
+
+import pytest
+
+from benchmarks.fake_services import TTS_WORD_GAP, fake_tts_synthesize
+from utility.audio import audio_generator
+from utility.audio.audio_generator import generate_audio, register_tts_backend, split_sentences
+
+SCRIPT = ("Octopuses have three hearts and blue blood. Honey never spoils, even after three thousand years. "
+          "A day on Venus is longer than a year on Venus. Sea otters hold hands while they sleep.")
+
+
+@pytest.fixture
+def synthesized(monkeypatch, tmp_path):
+    """Texts sent to the fake backend; the TTS cache lives under tmp_path"""
+    texts = []
+
+    async def recording_synthesize(text, voice):
+        texts.append(text)
+        return await fake_tts_synthesize(text, voice)
+
+    register_tts_backend("fake", recording_synthesize)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audio_generator, "TTS_CACHE_DIR", os.path.join(".cache", "tts"))
+    return texts
+
+
+def run(text, path):
+    return asyncio.run(generate_audio(text, str(path), backend="fake"))
+
+
+def test_word_offsets_match_stitched_audio(synthesized, tmp_path):
+    words = run(SCRIPT, tmp_path / "narration.wav")
+
+    assert len(synthesized) == len(split_sentences(SCRIPT)) > 1
+    assert [word["text"] for word in words] == SCRIPT.split()
+    assert all(earlier["end"] <= later["start"] for earlier, later in zip(words, words[1:]))
+    with wave.open(str(tmp_path / "narration.wav")) as wav:
+        duration = wav.getnframes() / wav.getframerate()
+    assert words[-1]["end"] + TTS_WORD_GAP == pytest.approx(duration, abs=0.01)
+
+
+def test_second_run_is_served_from_the_cache(synthesized, tmp_path):
+    first = run(SCRIPT, tmp_path / "first.wav")
+    synthesized.clear()
+    second = run(SCRIPT, tmp_path / "second.wav")
+
+    assert synthesized == []
+    assert second == first
+    assert (tmp_path / "first.wav").read_bytes() == (tmp_path / "second.wav").read_bytes()
+    assert os.listdir(tmp_path / ".cache" / "tts")
+
+
+def test_edited_sentence_only_synthesizes_its_chunk(synthesized, tmp_path):
+    run(SCRIPT, tmp_path / "first.wav")
+    synthesized.clear()
+    edited = SCRIPT.replace("Sea otters hold hands", "Sea otters hold paws")
+    run(edited, tmp_path / "edited.wav")
+
+    assert synthesized == [chunk for chunk in split_sentences(edited) if "paws" in chunk]
+
+
+@pytest.mark.parametrize("text", ["", "  \n "])
+def test_empty_script_raises(synthesized, tmp_path, text):
+    with pytest.raises(ValueError):
+        run(text, tmp_path / "empty.wav")
+    assert synthesized == []
+    assert not (tmp_path / "empty.wav").exists()
@@ -0,0 +1,23 @@
+"""Timestamp remapping of the VAD-trimmed Whisper path"""
+from utility.captions.fast_whisper import remap_time, remap_timestamps
+
+# 2 s of speech, 3 s of silence cut, then more speech
+OFFSETS = [(0.0, 0.0), (2.0, 5.0)]
+
+
+def test_times_inside_regions_shift_by_the_removed_silence():
+    assert remap_time(1.0, OFFSETS) == 1.0
+    assert remap_time(2.5, OFFSETS) == 5.5
+    assert remap_time(2.5, OFFSETS, end=True) == 5.5
+
+
+def test_times_on_a_cut_stay_with_their_own_region():
+    assert remap_time(2.0, OFFSETS) == 5.0
+    assert remap_time(2.0, OFFSETS, end=True) == 2.0
+
+
+def test_word_ending_on_a_cut_keeps_its_end():
+    analysis = {"segments": [{"start": 0.0, "end": 2.4, "words": [
+        {"text": "three", "start": 1.5, "end": 2.0}, {"text": "hearts", "start": 2.0, "end": 2.4}]}]}
+    words = remap_timestamps(analysis, OFFSETS)["segments"][0]["words"]
+    assert [(word["start"], word["end"]) for word in words] == [(1.5, 2.0), (5.0, 5.4)]
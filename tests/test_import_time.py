@@ -0,0 +1,15 @@
+"""Import-time regression check from benchmarks/import_time.py.
+
+Only the deterministic part runs here: no pipeline module may pull in one of
+the HEAVY_MODULES at import time. The millisecond budgets depend on the
+machine and stay in `python -m benchmarks.import_time`.
+"""
+import pytest
+
+from benchmarks import import_time
+
+
+@pytest.mark.parametrize("module", sorted(import_time.IMPORT_BUDGETS_MS))
+def test_no_heavy_imports(module):
+    _, imported = import_time.measure_import(module)
+    assert import_time.heavy_imports(imported) == []
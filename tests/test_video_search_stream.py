@@ -0,0 +1,81 @@
+"""Streamed keyword segments against benchmarks.fake_services.FakeChatServer"""
+import json
+
+import pytest
+
+pytest.importorskip("openai")
+
+import utility.utils
+from benchmarks.fake_services import FACTS, FakeChatServer
+from utility.video.video_search_query_generator import SegmentStreamParser, iterVideoSearchQueriesTimed
+
+CAPTION_SECONDS = 1.5
+SCRIPT = " ".join(FACTS)
+CAPTIONS = [((index * CAPTION_SECONDS, (index + 1) * CAPTION_SECONDS), text) for index, text in enumerate(FACTS)]
+
+
+@pytest.fixture
+def chat(request, monkeypatch, tmp_path):
+    options = getattr(request, "param", {})
+    with FakeChatServer(chunk_size=12, chunk_delay=0.02, **options) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_KEY", "fake")
+        monkeypatch.setenv("GROQ_API_KEY", "")
+        monkeypatch.setattr(utility.utils, "_llm_client", None)
+        # Responses are logged relative to the working directory
+        monkeypatch.chdir(tmp_path)
+        yield server
+
+
+def assert_consecutive(segments):
+    assert segments[0][0][0] == 0
+    for previous, segment in zip(segments, segments[1:]):
+        assert segment[0][0] == previous[0][1]
+    assert segments[-1][0][1] == CAPTIONS[-1][0][1]
+    assert all(len(keywords) == 3 for _, keywords in segments)
+
+
+def test_parser_yields_each_object_segment_when_it_closes():
+    parser = SegmentStreamParser()
+    text = json.dumps({"segments": [{"start": 0, "end": 2.5, "keywords": ["a [b]", "c"]},
+                                    {"start": 2.5, "end": 5, "keywords": ["d"]}]})
+    split = text.index("}") + 1
+    assert parser.feed(text[:split - 1]) == []
+    assert parser.feed(text[split - 1:split]) == [{"start": 0, "end": 2.5, "keywords": ["a [b]", "c"]}]
+    assert parser.feed(text[split:]) == [{"start": 2.5, "end": 5, "keywords": ["d"]}]
+
+
+def test_parser_reads_legacy_layout_character_by_character():
+    parser = SegmentStreamParser()
+    text = json.dumps([[[0, 2.5], ["a", "b"]], [[2.5, 5], ["c"]]])
+    elements = [element for char in text for element in parser.feed(char)]
+    assert elements == [[[0, 2.5], ["a", "b"]], [[2.5, 5], ["c"]]]
+
+
+def test_segments_are_yielded_before_the_stream_finishes(chat):
+    segments = iterVideoSearchQueriesTimed(SCRIPT, CAPTIONS)
+    first = next(segments)
+    assert chat.finished_streams == 0
+    rest = list(segments)
+
+    assert chat.finished_streams == 1
+    assert len(rest) >= 2
+    assert_consecutive([first] + rest)
+    assert [request["response_format"] for request in chat.requests] == ["json_schema"]
+
+
+@pytest.mark.parametrize("chat", [{"legacy_layout": True}], indirect=True)
+def test_legacy_layout_stream(chat):
+    segments = list(iterVideoSearchQueriesTimed(SCRIPT, CAPTIONS))
+    assert len(segments) >= 3
+    assert_consecutive(segments)
+    assert all(request["stream"] for request in chat.requests)
+
+
+@pytest.mark.parametrize("chat", [{"json_schema": False}], indirect=True)
+def test_json_object_fallback(chat):
+    segments = list(iterVideoSearchQueriesTimed(SCRIPT, CAPTIONS))
+    assert len(segments) >= 3
+    assert_consecutive(segments)
+    assert [(request["response_format"], request["rejected"]) for request in chat.requests] == [
+        ("json_schema", True), ("json_object", False)]
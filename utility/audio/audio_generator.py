@@ -1,10 +1,164 @@
-import edge_tts
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import time
+import wave
+from utility.progress import emit, report_progress
+from utility.tracing import count, span
 
-async def generate_audio(text,outputFilename):
-    communicate = edge_tts.Communicate(text,"en-AU-WilliamNeural")
-    await communicate.save(outputFilename)
+VOICE = "en-AU-WilliamNeural"
 
+# Name of the registered backend used by generate_audio ("edge" unless overridden)
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "edge")
 
+# Edge TTS reports word offsets in 100-nanosecond ticks
+TICKS_PER_SECOND = 10_000_000
 
+_tts_backends = {}
 
+def register_tts_backend(name, synthesize):
+    """Register an async synthesize(text, voice) -> (audio_bytes, words) backend.
 
+    words is a list of {"text", "start", "end"} dicts in seconds and may be empty.
+    """
+    _tts_backends[name] = synthesize
+
+async def edge_synthesize(text, voice):
+    import edge_tts
+
+    try:
+        # edge-tts 7 reports sentence boundaries unless word boundaries are requested
+        communicate = edge_tts.Communicate(text, voice, boundary="WordBoundary")
+    except TypeError:
+        # edge-tts 6 has no boundary option and always reports words
+        communicate = edge_tts.Communicate(text, voice)
+    audio = bytearray()
+    words = []
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio.extend(chunk["data"])
+        elif chunk["type"] == "WordBoundary":
+            start = chunk["offset"] / TICKS_PER_SECOND
+            words.append({"text": chunk["text"], "start": start, "end": start + chunk["duration"] / TICKS_PER_SECOND})
+    return bytes(audio), words
+
+register_tts_backend("edge", edge_synthesize)
+
+# Long scripts are synthesized sentence by sentence, TTS_CONCURRENCY chunks at a time
+TTS_CONCURRENCY = int(os.environ.get("TTS_CONCURRENCY", 4))
+TTS_RETRIES = int(os.environ.get("TTS_RETRIES", 2))
+# Sentences shorter than this are merged with the next one
+TTS_MIN_CHUNK_CHARS = 40
+# Synthesized chunks are cached per (backend, voice, text); empty disables the cache
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", ".cache/tts")
+
+# Edge TTS streams constant-bitrate audio-24khz-48kbitrate-mono-mp3
+MP3_BITRATE = 48000
+
+def split_sentences(text, min_chars=TTS_MIN_CHUNK_CHARS):
+    """Split text at sentence boundaries, merging sentences shorter than min_chars into the next"""
+    chunks = []
+    pending = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text.strip()):
+        pending = (pending + " " + sentence).strip()
+        if len(pending) >= min_chars:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks:
+            chunks[-1] += " " + pending
+        else:
+            chunks.append(pending)
+    return chunks
+
+def audio_duration(audio):
+    """Seconds of audio in a WAV file or a constant-bitrate MP3 stream"""
+    if audio[:4] == b"RIFF":
+        with wave.open(io.BytesIO(audio)) as wav:
+            return wav.getnframes() / wav.getframerate()
+    return len(audio) * 8 / MP3_BITRATE
+
+def stitch_audio(chunks):
+    """Concatenate synthesized chunks; WAV chunks are re-muxed, MP3 frames are appended as is"""
+    if chunks and all(chunk[:4] == b"RIFF" for chunk in chunks):
+        output = io.BytesIO()
+        with wave.open(output, "wb") as stitched:
+            for index, chunk in enumerate(chunks):
+                with wave.open(io.BytesIO(chunk)) as wav:
+                    if index == 0:
+                        stitched.setparams(wav.getparams())
+                    stitched.writeframes(wav.readframes(wav.getnframes()))
+        return output.getvalue()
+    return b"".join(chunks)
+
+def _cache_path(backend, voice, text):
+    key = hashlib.sha1("\n".join([backend, voice, text]).encode()).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, key)
+
+async def synthesize_chunk(backend, text, voice):
+    """(audio, words) for one chunk, from the TTS cache or the backend with retries"""
+    cache_path = _cache_path(backend, voice, text) if TTS_CACHE_DIR else None
+    if cache_path and os.path.exists(cache_path + ".json"):
+        count("cache_hits", source="tts")
+        with open(cache_path + ".audio", "rb") as infile:
+            audio = infile.read()
+        with open(cache_path + ".json") as infile:
+            return audio, json.load(infile)
+
+    for attempt in range(TTS_RETRIES + 1):
+        try:
+            with span("tts.chunk", backend=backend, characters=len(text), attempt=attempt + 1):
+                audio, words = await _tts_backends[backend](text, voice)
+            break
+        except Exception as e:
+            if attempt == TTS_RETRIES:
+                raise
+            print(f"⚠️  TTS chunk failed ({e}), retrying...")
+            count("retries", source="tts")
+    count("tts_characters", len(text), backend=backend)
+
+    if cache_path:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        with open(cache_path + ".audio", "wb") as outfile:
+            outfile.write(audio)
+        # The timings file is written last and marks the entry as complete
+        with open(cache_path + ".json", "w") as outfile:
+            json.dump(words, outfile)
+    return audio, words
+
+async def generate_audio(text,outputFilename,on_event=None,backend=None):
+    """Synthesize text into outputFilename and return the word timings, if the backend has them.
+
+    The text is split into sentences that are synthesized concurrently and
+    stitched back together with each chunk's words shifted by its start time.
+    """
+    backend = backend or TTS_BACKEND
+    chunks = split_sentences(text)
+    if not chunks:
+        raise ValueError("No text to synthesize: the script is empty")
+    semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
+    started = time.perf_counter()
+    done = 0
+
+    async def synthesize(chunk):
+        nonlocal done
+        async with semaphore:
+            result = await synthesize_chunk(backend, chunk, VOICE)
+        done += 1
+        report_progress(on_event, "audio", done, len(chunks), started, "Synthesizing narration")
+        return result
+
+    with span("tts." + backend, characters=len(text), chunks=len(chunks)):
+        results = await asyncio.gather(*(synthesize(chunk) for chunk in chunks))
+        words = []
+        offset = 0
+        for audio, chunk_words in results:
+            words.extend(dict(word, start=word["start"] + offset, end=word["end"] + offset) for word in chunk_words)
+            offset += audio_duration(audio)
+        with open(outputFilename, "wb") as outfile:
+            outfile.write(stitch_audio([audio for audio, _ in results]))
+    emit(on_event, "audio", message=f"Synthesized {len(text)} characters in {len(chunks)} chunks")
+    return words
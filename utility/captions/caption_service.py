@@ -0,0 +1,185 @@
+"""In-process Whisper caption service shared by every job.
+
+One worker thread owns the loaded Whisper models and transcribes queued
+requests one after another, so concurrent Streamlit sessions or batch jobs no
+longer load their own model copy or run competing torch thread pools. Waiting
+requests that use the same model and options are pulled forward and run back
+to back while that model is hot. Torch intra-op threads are pinned to
+WHISPER_THREADS. WHISPER_FAST=1 switches to the quantized fast path in
+utility.captions.fast_whisper.
+
+    analysis, timings = get_caption_service().transcribe(audio_file)
+
+Queue depth is exported as the caption_queue_depth gauge and wait/service
+times as counters (see utility.tracing).
+"""
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from utility.captions.fast_whisper import DECODE_OPTIONS, WHISPER_FAST, quantize_model, transcribe_fast
+from utility.tracing import count, register_gauge
+
+# Torch threads for transcription; defaults to half the cores so rendering keeps some
+WHISPER_THREADS = int(os.environ.get("WHISPER_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+# Most requests run back to back on one model before queued requests for other models get a turn
+CAPTION_BATCH_SIZE = int(os.environ.get("CAPTION_BATCH_SIZE", 4))
+
+
+def load_whisper_model(model_size, fast=False):
+    """Whisper model for CPU inference, int8-quantized in fast mode"""
+    from whisper_timestamped import load_model
+
+    if not fast:
+        return load_model(model_size)
+    # Dynamic int8 quantization only runs on the CPU
+    return quantize_model(load_model(model_size, device="cpu"))
+
+
+def run_transcription(model, audio_filename, fast=False, **options):
+    """Whisper analysis (text, segments with word timings) of an audio file"""
+    if fast:
+        return transcribe_fast(model, audio_filename, **options)
+    from whisper_timestamped import transcribe_timestamped
+
+    return transcribe_timestamped(model, audio_filename, verbose=False, fp16=False, **dict(DECODE_OPTIONS, **options))
+
+
+class CaptionRequest:
+    def __init__(self, audio_filename, model_size, fast, options):
+        self.audio_filename = audio_filename
+        self.model_size = model_size
+        self.fast = fast
+        self.options = options
+        # Requests with the same key can share a batch
+        self.key = (model_size, fast, tuple(sorted(options.items())))
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class CaptionService:
+    """Queue of transcription requests served by a single worker thread"""
+
+    def __init__(self, threads=WHISPER_THREADS, batch_size=CAPTION_BATCH_SIZE):
+        self.threads = threads
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        # Requests taken off the queue while batching for another model, oldest first
+        self._waiting = collections.deque()
+        self._models = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"completed": 0, "failed": 0, "batches": 0, "in_flight": 0,
+                       "wait_seconds": 0.0, "service_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def submit(self, audio_filename, model_size="base", fast=WHISPER_FAST, **options):
+        """Queue a transcription; the Future resolves to (whisper_analysis, timings).
+
+        fast selects the quantized, VAD-trimmed path (see utility.captions.fast_whisper).
+        """
+        self._start()
+        request = CaptionRequest(audio_filename, model_size, fast, options)
+        self._queue.put(request)
+        count("caption_requests", model=model_size, fast=fast)
+        return request.future
+
+    def transcribe(self, audio_filename, model_size="base", fast=WHISPER_FAST, **options):
+        return self.submit(audio_filename, model_size, fast, **options).result()
+
+    def queue_depth(self):
+        return self._queue.qsize() + len(self._waiting)
+
+    def stats(self):
+        """Queue depth, request counts and mean/max latencies in seconds"""
+        with self._lock:
+            stats = dict(self._stats)
+        finished = stats["completed"] + stats["failed"]
+        stats["queue_depth"] = self.queue_depth()
+        stats["mean_wait_seconds"] = stats["wait_seconds"] / finished if finished else 0.0
+        stats["mean_service_seconds"] = stats["service_seconds"] / finished if finished else 0.0
+        return stats
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="caption-service", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        first = self._waiting.popleft() if self._waiting else self._queue.get()
+        batch = [first]
+        for request in list(self._waiting):
+            if len(batch) < self.batch_size and request.key == first.key:
+                self._waiting.remove(request)
+                batch.append(request)
+        while len(batch) < self.batch_size:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request.key == first.key:
+                batch.append(request)
+            else:
+                self._waiting.append(request)
+        return batch
+
+    def _model(self, model_size, fast):
+        if (model_size, fast) not in self._models:
+            started = time.perf_counter()
+            self._models[model_size, fast] = load_whisper_model(model_size, fast)
+            count("caption_model_load_seconds", time.perf_counter() - started, model=model_size, fast=fast)
+        return self._models[model_size, fast]
+
+    def _run(self):
+        try:
+            import torch
+
+            # Intra-op threads are process-wide in torch; only this thread runs Whisper
+            torch.set_num_threads(self.threads)
+        except ImportError:
+            pass  # Each request then fails with the missing Whisper dependency
+        while True:
+            batch = self._next_batch()
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["in_flight"] = len(batch)
+            for request in batch:
+                self._transcribe(request, len(batch))
+
+    def _transcribe(self, request, batch_size):
+        started = time.perf_counter()
+        wait = started - request.submitted
+        try:
+            model = self._model(request.model_size, request.fast)
+            analysis = run_transcription(model, request.audio_filename, request.fast, **request.options)
+            outcome = "completed"
+        except Exception as e:
+            outcome = "failed"
+            request.future.set_exception(e)
+        service = time.perf_counter() - started
+        with self._lock:
+            self._stats[outcome] += 1
+            self._stats["in_flight"] -= 1
+            self._stats["wait_seconds"] += wait
+            self._stats["service_seconds"] += service
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+        count("caption_wait_seconds", wait, model=request.model_size)
+        count("caption_service_seconds", service, model=request.model_size)
+        if outcome == "completed":
+            request.future.set_result((analysis, {"wait": wait, "service": service, "batch_size": batch_size}))
+
+
+_caption_service = None
+_caption_service_lock = threading.Lock()
+
+
+def get_caption_service():
+    """Process-wide CaptionService"""
+    global _caption_service
+    with _caption_service_lock:
+        if _caption_service is None:
+            _caption_service = CaptionService()
+            register_gauge("caption_queue_depth", _caption_service.queue_depth)
+    return _caption_service
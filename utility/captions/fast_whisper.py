@@ -0,0 +1,118 @@
+"""Opt-in CPU fast path for Whisper captions.
+
+Two independent savings, both enabled by WHISPER_FAST=1:
+
+- the model's Linear layers are dynamically quantized to int8,
+- silence longer than VAD_MIN_SILENCE is cut out of the audio with a simple
+  energy VAD before decoding, and the word timestamps are mapped back onto the
+  original audio afterwards.
+
+Both paths decode with the same DECODE_OPTIONS, so
+benchmarks/caption_bench.py measures only these two against the default path
+(speedup and timing drift).
+"""
+import os
+
+WHISPER_FAST = os.environ.get("WHISPER_FAST", "").lower() in ("1", "true", "yes")
+
+SAMPLE_RATE = 16000
+# Analysis frame length in seconds
+VAD_FRAME = 0.03
+# Frames quieter than this many dB below the loudest frame count as silence
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", 35))
+# Only silences at least this long are cut; this much audio is kept on each side of speech
+VAD_MIN_SILENCE = float(os.environ.get("VAD_MIN_SILENCE", 0.5))
+VAD_PADDING = 0.15
+
+# Decoding options of the default and the fast path alike: whisper_timestamped's
+# defaults (greedy, no temperature fallback), spelled out so neither path drifts
+DECODE_OPTIONS = {"temperature": 0.0, "beam_size": None, "best_of": None}
+
+
+def quantize_model(model):
+    """Dynamically quantize every Linear layer of a Whisper model to int8 (CPU only)"""
+    import torch
+    import whisper.model
+
+    for module in model.modules():
+        # whisper.model.Linear only adds a dtype cast on forward, which float32 on CPU does not need;
+        # quantize_dynamic matches exact types, so treat those layers as plain Linear
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def speech_regions(samples, sample_rate=SAMPLE_RATE):
+    """[(start, end)] sample ranges to keep, with silences shorter than VAD_MIN_SILENCE left in"""
+    import numpy as np
+
+    frame = int(VAD_FRAME * sample_rate)
+    frames = len(samples) // frame
+    if frames == 0:
+        return [(0, len(samples))]
+    energy = np.sqrt(np.mean(samples[:frames * frame].reshape(frames, frame).astype(np.float64) ** 2, axis=1))
+    loudness = 20 * np.log10(energy + 1e-10)
+    voiced = np.flatnonzero(loudness > loudness.max() - VAD_THRESHOLD_DB)
+    if len(voiced) == 0:
+        return [(0, len(samples))]
+
+    padding = int(VAD_PADDING / VAD_FRAME)
+    min_gap = int(VAD_MIN_SILENCE / VAD_FRAME)
+    regions = []
+    start = end = voiced[0]
+    for index in voiced[1:]:
+        if index - end > min_gap:
+            regions.append((start, end))
+            start = index
+        end = index
+    regions.append((start, end))
+    return [(max(0, start - padding) * frame, min(frames, end + 1 + padding) * frame) for start, end in regions]
+
+
+def trim_silence(samples, sample_rate=SAMPLE_RATE):
+    """(trimmed_samples, offsets) where offsets are (trimmed_start, original_start) pairs in seconds"""
+    import numpy as np
+
+    regions = speech_regions(samples, sample_rate)
+    offsets = []
+    position = 0
+    for start, end in regions:
+        offsets.append((position / sample_rate, start / sample_rate))
+        position += end - start
+    return np.concatenate([samples[start:end] for start, end in regions]), offsets
+
+
+def remap_time(seconds, offsets, end=False):
+    """Map a timestamp in the trimmed audio back onto the original audio.
+
+    A timestamp exactly on a cut belongs to the region after it, or to the one
+    before it when end=True, so ends do not jump over the removed silence.
+    """
+    trimmed_start, original_start = offsets[0]
+    for region in offsets:
+        if region[0] > seconds or (end and region[0] == seconds):
+            break
+        trimmed_start, original_start = region
+    return original_start + seconds - trimmed_start
+
+
+def remap_timestamps(analysis, offsets):
+    """Shift segment and word timestamps of a transcription in place; returns it"""
+    for segment in analysis.get("segments", []):
+        for item in [segment] + segment.get("words", []):
+            for key in ("start", "end"):
+                if key in item:
+                    item[key] = round(remap_time(item[key], offsets, end=key == "end"), 3)
+    return analysis
+
+
+def transcribe_fast(model, audio_filename, **options):
+    """transcribe_timestamped on VAD-trimmed audio, timestamps in original time"""
+    import whisper
+    from whisper_timestamped import transcribe_timestamped
+
+    audio = whisper.load_audio(audio_filename)
+    samples, offsets = trim_silence(audio)
+    analysis = transcribe_timestamped(model, samples, verbose=False, fp16=False, **dict(DECODE_OPTIONS, **options))
+    analysis["trimmed_seconds"] = (len(audio) - len(samples)) / SAMPLE_RATE
+    return remap_timestamps(analysis, offsets)
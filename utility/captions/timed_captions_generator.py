@@ -1,14 +1,36 @@
-import whisper_timestamped as whisper
-from whisper_timestamped import load_model, transcribe_timestamped
 import re
+import time
+from utility.captions.caption_service import get_caption_service
+from utility.captions.fast_whisper import WHISPER_FAST
+from utility.progress import emit
+from utility.tracing import add_span
 
-def generate_timed_captions(audio_filename,model_size="base"):
-    WHISPER_MODEL = load_model(model_size)
-   
-    gen = transcribe_timestamped(WHISPER_MODEL, audio_filename, verbose=False, fp16=False)
+def generate_timed_captions(audio_filename,model_size="base",on_event=None,fast=None):
+    """Transcribe through the shared caption service and return timed captions.
+
+    fast=None follows WHISPER_FAST; see utility.captions.fast_whisper.
+    """
+    fast = WHISPER_FAST if fast is None else fast
+    service = get_caption_service()
+    queued = service.queue_depth()
+    emit(on_event, "captions", message=f"Transcribing narration with Whisper '{model_size}'{' (fast)' if fast else ''}"
+         + (f" ({queued} requests ahead)" if queued else ""))
+    start = time.time()
+    gen, timings = service.transcribe(audio_filename, model_size, fast)
+    add_span("whisper.queue_wait", start, timings["wait"], model=model_size)
+    add_span("whisper.transcribe", start + timings["wait"], timings["service"], model=model_size, fast=fast,
+             batch_size=timings["batch_size"], trimmed_seconds=gen.get("trimmed_seconds", 0))
    
     return getCaptionsWithTime(gen)
 
+def getCaptionsFromWords(words, maxCaptionSize=15):
+    """Build timed captions from TTS word timings ({"text", "start", "end"} dicts) without Whisper"""
+    analysis = {
+        "text": " ".join(word["text"] for word in words),
+        "segments": [{"words": [{"text": word["text"], "end": word["end"]} for word in words]}],
+    }
+    return getCaptionsWithTime(analysis, maxCaptionSize)
+
 def splitWordsBySize(words, maxCaptionSize):
    
     halfCaptionSize = maxCaptionSize / 2
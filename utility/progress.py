@@ -0,0 +1,102 @@
+"""Progress events shared by the pipeline stages.
+
+Stages accept an optional on_event callable and report through emit(); they
+never know whether the web UI, the CLI or nothing at all is listening. An event
+is a plain dict:
+
+    {"stage": "render", "kind": "progress", "message": None, "level": "info",
+     "progress": 0.42, "current": 210, "total": 500, "eta": 12.5, "elapsed": 9.1,
+     "time": 1700000000.0}
+
+kind is one of "start", "end", "progress" or "message". Passing on_event=None
+keeps a stage silent, which is what headless batch workers want.
+"""
+import time
+from contextlib import contextmanager
+
+from utility.tracing import span
+
+# Minimum seconds between two "progress" events of the same bar
+PROGRESS_INTERVAL = 0.5
+
+
+def emit(on_event, stage, kind="message", message=None, level="info", **fields):
+    """Send one event to on_event if a sink is attached"""
+    if on_event is None:
+        return
+    event = {"stage": stage, "kind": kind, "message": message, "level": level, "time": time.time()}
+    event.update(fields)
+    on_event(event)
+
+
+@contextmanager
+def stage(on_event, name, message=None):
+    """Emit start/end events around a pipeline stage and trace it as a span"""
+    emit(on_event, name, "start", message)
+    started = time.perf_counter()
+    with span(name):
+        yield
+    emit(on_event, name, "end", elapsed=time.perf_counter() - started)
+
+
+def report_progress(on_event, stage_name, current, total, started, message=None):
+    """Emit a progress event with an ETA extrapolated from the elapsed time"""
+    elapsed = time.perf_counter() - started
+    progress = current / total if total else None
+    eta = elapsed * (total - current) / current if current and total else None
+    emit(on_event, stage_name, "progress", message, progress=progress, current=current, total=total,
+         eta=eta, elapsed=elapsed)
+
+
+def make_encoder_logger(on_event, stage_name="render"):
+    """Proglog logger that turns MoviePy's frame bar into throttled progress events.
+
+    Returns None without a sink so write_videofile stays completely silent.
+    """
+    if on_event is None:
+        return None
+    from proglog import ProgressBarLogger
+
+    class EncoderProgressLogger(ProgressBarLogger):
+        def __init__(self):
+            super().__init__()
+            self._started = {}
+            self._last_report = 0
+
+        def callback(self, **changes):
+            message = changes.get("message")
+            if message:
+                emit(on_event, stage_name, "message", message.strip())
+
+        def bars_callback(self, bar, attr, value, old_value=None):
+            # MoviePy names the frame bar "t" and the audio bar "chunk"
+            if bar != "t" or attr != "index":
+                return
+            total = self.bars[bar]["total"]
+            now = time.perf_counter()
+            started = self._started.setdefault(bar, now)
+            if value + 1 < (total or 0) and now - self._last_report < PROGRESS_INTERVAL:
+                return
+            self._last_report = now
+            report_progress(on_event, stage_name, value + 1, total, started, "Encoding frames")
+
+    return EncoderProgressLogger()
+
+
+_printed_progress = {}
+
+
+def print_sink(event):
+    """Event sink for the command line: messages, stage timings and progress in 10% steps"""
+    if event["kind"] == "start":
+        print("▶️  {}{}".format(event["stage"], ": " + event["message"] if event["message"] else ""))
+    elif event["kind"] == "end":
+        print("✅ {} finished in {:.1f}s".format(event["stage"], event["elapsed"]))
+    elif event["kind"] == "progress":
+        progress = event.get("progress")
+        if progress is not None and int(progress * 10) != _printed_progress.get(event["stage"]):
+            _printed_progress[event["stage"]] = int(progress * 10)
+            eta = " (ETA {:.0f}s)".format(event["eta"]) if event.get("eta") is not None else ""
+            print("   {} {:5.1f}%{}".format(event["stage"], event["progress"] * 100, eta))
+    elif event["message"]:
+        print(event["message"])
@@ -0,0 +1,199 @@
+"""Per-job storage for rendered outputs, streamed over HTTP.
+
+Each job writes its files into ARTIFACT_DIR/<job_id>/. start_artifact_server
+serves that folder from a daemon thread with HTTP Range support, so the web
+UI can hand the browser a URL and the video player seeks by fetching only the
+bytes it needs instead of Streamlit reading whole files into memory:
+
+    store = get_artifact_store()
+    output_file = store.path(job_id, "video.mp4")
+    ...render into output_file...
+    st.video(store.url(job_id, "video.mp4"))
+
+ARTIFACT_PUBLIC_URL is the address browsers use to reach the server (set it
+when running behind Docker port mappings or a proxy).
+"""
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "artifacts")
+ARTIFACT_PORT = int(os.environ.get("ARTIFACT_PORT", 8502))
+ARTIFACT_PUBLIC_URL = os.environ.get("ARTIFACT_PUBLIC_URL", "http://localhost:{}".format(ARTIFACT_PORT))
+# Job folders older than this are deleted by cleanup(), which runs at server start and before
+# each web job; 0 keeps everything
+ARTIFACT_MAX_AGE_HOURS = float(os.environ.get("ARTIFACT_MAX_AGE_HOURS", 24))
+
+# Bytes sent per write when streaming a file
+CHUNK_SIZE = 256 * 1024
+
+# Progressive renders (see render_engine.RENDER_OUTPUT) are HLS playlists of fragmented-MP4 segments
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/iso.segment", ".m4s")
+
+_JOB_ID = re.compile(r"^[\w.-]+$")
+
+
+class ArtifactStore:
+    """Folder of per-job artifact folders"""
+
+    def __init__(self, directory=ARTIFACT_DIR, public_url=ARTIFACT_PUBLIC_URL):
+        # Real path: resolve() compares against resolved request paths, so a symlinked folder must match
+        self.directory = os.path.realpath(directory)
+        self.public_url = public_url.rstrip("/")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def job_dir(self, job_id):
+        if not _JOB_ID.match(job_id) or job_id in (".", ".."):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        directory = os.path.join(self.directory, job_id)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def path(self, job_id, name):
+        """Local path of an artifact, creating the job folder"""
+        return os.path.join(self.job_dir(job_id), os.path.basename(name))
+
+    def url(self, job_id, name, download=False):
+        """Public URL of an artifact (a local path or a path relative to the job folder).
+
+        download=True asks the browser to save it.
+        """
+        if os.path.isabs(name):
+            name = os.path.relpath(name, self.job_dir(job_id))
+        name = os.path.normpath(name).replace(os.sep, "/")
+        if name.startswith(".."):
+            raise ValueError(f"Artifact outside the job folder: {name!r}")
+        return "{}/{}/{}{}".format(self.public_url, job_id, name, "?download=1" if download else "")
+
+    def publish(self, job_id, source_path, name=None):
+        """Move a file that was written elsewhere into the job folder and return its new path"""
+        destination = self.path(job_id, name or source_path)
+        shutil.move(source_path, destination)
+        return destination
+
+    def resolve(self, relative_path):
+        """Local file for a URL path below the store, or None (no escaping the store folder)"""
+        path = os.path.realpath(os.path.join(self.directory, relative_path.lstrip("/")))
+        if not path.startswith(self.directory + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def cleanup(self, max_age_hours=ARTIFACT_MAX_AGE_HOURS):
+        """Delete job folders not modified for max_age_hours"""
+        if not max_age_hours:
+            return 0
+        cutoff = time.time() - max_age_hours * 3600
+        removed = 0
+        for job_id in os.listdir(self.directory):
+            directory = os.path.join(self.directory, job_id)
+            if os.path.isdir(directory) and os.path.getmtime(directory) < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+def parse_range(header, size):
+    """(start, end) inclusive byte range of a 'bytes=' Range header, None for the whole file.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", (header or "").strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+_artifact_store = None
+
+
+def get_artifact_store():
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore()
+    return _artifact_store
+
+
+_artifact_server = None
+
+
+def start_artifact_server(port=ARTIFACT_PORT, host="0.0.0.0", store=None):
+    """Serve the artifact store with Range support from a daemon thread (idempotent)"""
+    global _artifact_server
+    if _artifact_server is not None:
+        return _artifact_server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    store = store or get_artifact_store()
+    store.cleanup()
+
+    class ArtifactHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_HEAD(self):
+            self._serve(body=False)
+
+        def do_GET(self):
+            self._serve(body=True)
+
+        def _serve(self, body):
+            url_path, _, query = self.path.partition("?")
+            path = store.resolve(url_path)
+            if path is None:
+                self.send_error(404)
+                return
+            size = os.path.getsize(path)
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */{}".format(size))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start, end = byte_range or (0, size - 1)
+
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            if byte_range:
+                self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, size))
+            if "download=1" in query.split("&"):
+                self.send_header("Content-Disposition", 'attachment; filename="{}"'.format(os.path.basename(path)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            # Playlists and manifests change while a render is running
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if not body:
+                return
+            with open(path, "rb") as infile:
+                infile.seek(start)
+                remaining = end - start + 1
+                try:
+                    while remaining > 0:
+                        chunk = infile.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        remaining -= len(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The player aborted the request, e.g. to seek elsewhere
+
+    _artifact_server = ThreadingHTTPServer((host, port), ArtifactHandler)
+    _artifact_server.daemon_threads = True
+    threading.Thread(target=_artifact_server.serve_forever, daemon=True).start()
+    print(f"📦 Artifacts served at {store.public_url}")
+    return _artifact_server
@@ -1,27 +1,12 @@
 import time
 import os
-import tempfile
+import json
 import zipfile
 import platform
 import subprocess
-try:
-    from moviepy.editor import (AudioFileClip, CompositeVideoClip, CompositeAudioClip, ImageClip,
-                                TextClip, VideoFileClip)
-except ImportError:
-    from moviepy import (AudioFileClip, CompositeVideoClip, CompositeAudioClip, ImageClip,
-                      TextClip, VideoFileClip)
-from moviepy.audio.fx.audio_loop import audio_loop
-from moviepy.audio.fx.audio_normalize import audio_normalize
-import requests
-import streamlit as st
-
-def download_file(url, filename):
-    with open(filename, 'wb') as f:
-        headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers)
-        f.write(response.content)
+from utility.progress import emit, make_encoder_logger, report_progress
+from utility.tracing import span
+from utility.video.footage_providers import ffmpeg_binary, get_footage_provider
 
 def search_program(program_name):
     try: 
@@ -53,9 +38,27 @@ def get_program_path(program_name):
     
     return None
 
-def get_output_media(audio_file_path, timed_captions, background_video_data, video_server):
-    OUTPUT_FILE_NAME = "rendered_video.mp4"
-    
+OUTPUT_FILE_NAME = "rendered_video.mp4"
+# Frame size of the output; background clips of any other size are scaled and cropped to it
+OUTPUT_SIZE = (1920, 1080)
+OUTPUT_FPS = 25
+OUTPUT_PRESET = os.environ.get('RENDER_PRESET', 'veryfast')
+RENDER_BACKEND = os.environ.get('RENDER_BACKEND', 'moviepy')
+# "mp4" writes OUTPUT_FILE_NAME at the end of the encode; "hls" also streams fragmented-MP4 HLS segments
+# while encoding (see progressive_dir) and remuxes them into OUTPUT_FILE_NAME when done
+RENDER_OUTPUT = os.environ.get('RENDER_OUTPUT', 'mp4')
+HLS_SEGMENT_SECONDS = 2
+
+def _moviepy():
+    """Import MoviePy lazily; 1.x exposes the clip classes in moviepy.editor"""
+    try:
+        import moviepy.editor as moviepy
+    except ImportError:
+        import moviepy
+    return moviepy
+
+def configure_imagemagick(on_event=None):
+    """Point MoviePy's TextClip at the ImageMagick binary"""
     # Try to detect ImageMagick binary
     magick_path = get_program_path("magick")
     
@@ -63,24 +66,134 @@ def get_output_media(audio_file_path, timed_captions, background_video_data, vid
     if not magick_path:
         magick_path = get_program_path("convert")
     
-    print(f"ImageMagick path detected: {magick_path}")
-    
-    # Try to use streamlit if available, otherwise just print
+    if magick_path:
+        os.environ['IMAGEMAGICK_BINARY'] = magick_path
+    else:
+        # Set fallback paths
+        os.environ['IMAGEMAGICK_BINARY'] = '/usr/bin/convert'
+
+    if magick_path:
+        emit(on_event, "render", message=f"✅ ImageMagick found at: {magick_path}")
+    else:
+        emit(on_event, "render", message="⚠️ ImageMagick not found, attempting to use system default...", level="warning")
+        emit(on_event, "render", message="💡 If you see text rendering errors, install ImageMagick: sudo apt install imagemagick")
+    return magick_path
+
+def build_caption_clips(timed_captions):
+    """One positioned TextClip per caption, timed to its interval"""
+    moviepy = _moviepy()
+    caption_clips = []
+    with span("render.captions", captions=len(timed_captions)):
+        for (t1, t2), text in timed_captions:
+            text_clip = moviepy.TextClip(txt=text, fontsize=100, color="white", stroke_width=3, stroke_color="black", method="label")
+            text_clip = text_clip.set_start(t1)
+            text_clip = text_clip.set_end(t2)
+            text_clip = text_clip.set_position(["center", 800])
+            caption_clips.append(text_clip)
+    return caption_clips
+
+def fit_clip(clip, size=OUTPUT_SIZE):
+    """Scale a clip to cover size and crop the overflow around its centre"""
+    width, height = size
+    if tuple(clip.size) == (width, height):
+        return clip
+    scale = max(width / clip.w, height / clip.h)
+    clip = clip.resize(newsize=(max(width, round(clip.w * scale)), max(height, round(clip.h * scale))))
+    return clip.crop(x_center=clip.w / 2, y_center=clip.h / 2, width=width, height=height)
+
+def render_moviepy(audio_file_path, timed_captions, background_clips, output_file, fps, preset, on_event=None,
+                   ffmpeg_params=None, size=OUTPUT_SIZE):
+    """Composite background clips, captions and narration with MoviePy and encode with libx264.
+
+    background_clips is a list of ((t1, t2), local_video_path) in any
+    resolution; ffmpeg_params are extra output options such as the HLS muxer
+    settings.
+    """
+    moviepy = _moviepy()
+    visual_clips = []
+    for (t1, t2), video_filename in background_clips:
+        # Local and lower-resolution footage comes in any size; captions are placed for size
+        video_clip = fit_clip(moviepy.VideoFileClip(video_filename), size)
+        video_clip = video_clip.set_start(t1)
+        video_clip = video_clip.set_end(t2)
+        visual_clips.append(video_clip)
+
+    visual_clips.extend(build_caption_clips(timed_captions))
+
+    video = moviepy.CompositeVideoClip(visual_clips, size=size)
+
+    audio = moviepy.CompositeAudioClip([moviepy.AudioFileClip(audio_file_path)])
+    video.duration = audio.duration
+    video.audio = audio
+
+    with span("render.encode", backend="moviepy", duration=video.duration, fps=fps, preset=preset):
+        # MoviePy names its temporary audio after the output and puts it in the working directory;
+        # keep it next to the output so concurrent jobs (all writing video.mp4) do not share it
+        video.write_videofile(output_file, codec='libx264', audio_codec='aac', fps=fps, preset=preset,
+                              ffmpeg_params=ffmpeg_params, logger=make_encoder_logger(on_event),
+                              temp_audiofile=os.path.splitext(output_file)[0] + "_TEMP_audio.m4a")
+    video.close()
+    return output_file
+
+# Render backends by name:
+# fn(audio_file_path, timed_captions, background_clips, output_file, fps, preset, on_event, ffmpeg_params=None)
+RENDER_BACKENDS = {
+    "moviepy": render_moviepy,
+}
+
+def progressive_dir(output_file):
+    """Folder holding the HLS playlist, segments and manifest.json of a progressive render"""
+    return os.path.splitext(output_file)[0] + "_stream"
+
+def hls_params(stream_dir, segment_seconds=HLS_SEGMENT_SECONDS):
+    """ffmpeg output options for an event HLS playlist of fragmented-MP4 segments"""
+    return ["-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", os.path.join(stream_dir, "segment_%05d.m4s"),
+            # A keyframe at every segment boundary so segments are cut on time
+            "-force_key_frames", "expr:gte(t,n_forced*{})".format(segment_seconds)]
+
+def write_manifest(stream_dir, status, **fields):
+    """Replace manifest.json, which players poll to find the playlist and the render status"""
+    manifest = dict(fields, status=status, format="hls", playlist="index.m3u8", updated_at=time.time())
+    path = os.path.join(stream_dir, "manifest.json")
+    with open(path + ".tmp", "w") as outfile:
+        json.dump(manifest, outfile)
+    os.replace(path + ".tmp", path)
+
+def remux_faststart(source, output_file):
+    """Copy a rendered stream into a regular MP4 with the moov atom first, for download"""
+    with span("render.remux", source=os.path.basename(source)):
+        subprocess.run([ffmpeg_binary(), "-y", "-v", "error", "-i", source, "-c", "copy", "-movflags", "+faststart",
+                        output_file], check=True, capture_output=True)
+    return output_file
+
+def render_progressive(render, audio_file_path, timed_captions, background_clips, output_file, fps, preset, on_event):
+    """Render as HLS into progressive_dir(output_file) while encoding, then remux to output_file"""
+    stream_dir = progressive_dir(output_file)
+    os.makedirs(stream_dir, exist_ok=True)
+    write_manifest(stream_dir, "rendering")
+    emit(on_event, "render", message=f"Streaming segments to {stream_dir} while rendering")
     try:
-        if magick_path:
-            st.info(f"✅ ImageMagick found at: {magick_path}")
-            os.environ['IMAGEMAGICK_BINARY'] = magick_path
-        else:
-            st.warning(f"⚠️ ImageMagick not found, attempting to use system default...")
-            st.info("💡 If you see text rendering errors, install ImageMagick: sudo apt install imagemagick")
-            # Set fallback paths
-            os.environ['IMAGEMAGICK_BINARY'] = '/usr/bin/convert'
-    except NameError:
-        # Streamlit not available (running outside of Streamlit)
-        if magick_path:
-            os.environ['IMAGEMAGICK_BINARY'] = magick_path
-        else:
-            os.environ['IMAGEMAGICK_BINARY'] = '/usr/bin/convert'
+        playlist = os.path.join(stream_dir, "index.m3u8")
+        render(audio_file_path, timed_captions, background_clips, playlist, fps, preset, on_event,
+               ffmpeg_params=hls_params(stream_dir))
+        remux_faststart(playlist, output_file)
+    except Exception as e:
+        write_manifest(stream_dir, "failed", error=str(e))
+        raise
+    write_manifest(stream_dir, "done", video=os.path.basename(output_file))
+    return output_file
+
+def get_output_media(audio_file_path, timed_captions, background_video_data, video_server, on_event=None,
+                     backend=None, output_file=OUTPUT_FILE_NAME, fps=OUTPUT_FPS, preset=OUTPUT_PRESET,
+                     output_mode=RENDER_OUTPUT):
+    """Render the final video; progress is reported to on_event (see utility.progress).
+
+    output_mode="hls" makes the video playable from progressive_dir(output_file)
+    a few seconds into the encode; output_file is still written at the end.
+    """
+    configure_imagemagick(on_event)
     
     # Check if audio file exists
     if not audio_file_path or not os.path.exists(audio_file_path):
@@ -88,46 +201,36 @@ def get_output_media(audio_file_path, timed_captions, background_video_data, vid
     
     # Store temporary video filenames for cleanup
     downloaded_video_files = []
-    visual_clips = []
+    background_clips = []
+    provider = get_footage_provider(video_server)
     
-    for (t1, t2), video_url in background_video_data:
-        # Download the video file
-        video_filename = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
-        download_file(video_url, video_filename)
-        downloaded_video_files.append(video_filename)
-        
-        # Create VideoFileClip from the downloaded file
-        video_clip = VideoFileClip(video_filename)
-        video_clip = video_clip.set_start(t1)
-        video_clip = video_clip.set_end(t2)
-        visual_clips.append(video_clip)
-    
-    audio_clips = []
-    audio_file_clip = AudioFileClip(audio_file_path)
-    audio_clips.append(audio_file_clip)
-
-    for (t1, t2), text in timed_captions:
-        text_clip = TextClip(txt=text, fontsize=100, color="white", stroke_width=3, stroke_color="black", method="label")
-        text_clip = text_clip.set_start(t1)
-        text_clip = text_clip.set_end(t2)
-        text_clip = text_clip.set_position(["center", 800])
-        visual_clips.append(text_clip)
-
-    video = CompositeVideoClip(visual_clips)
-    
-    if audio_clips:
-        audio = CompositeAudioClip(audio_clips)
-        video.duration = audio.duration
-        video.audio = audio
+    try:
+        download_started = time.perf_counter()
+        for index, ((t1, t2), video_url) in enumerate(background_video_data):
+            report_progress(on_event, "download", index, len(background_video_data), download_started,
+                            "Downloading background videos")
+            # Remote footage is fetched to a temporary file, cut to the segment length when the server allows
+            # (clips are used from their start, see render_moviepy); local footage is used in place
+            video_filename, is_temporary = provider.fetch(video_url, seconds=t2 - t1)
+            if is_temporary:
+                downloaded_video_files.append(video_filename)
+            background_clips.append(((t1, t2), video_filename))
 
-    video.write_videofile(OUTPUT_FILE_NAME, codec='libx264', audio_codec='aac', fps=25, preset='veryfast')
-    
-    # Clean up downloaded video files
-    for video_filename in downloaded_video_files:
-        try:
-            if os.path.exists(video_filename):
-                os.remove(video_filename)
-        except Exception as e:
-            print(f"Warning: Could not delete temporary file {video_filename}: {e}")
-
-    return OUTPUT_FILE_NAME
+        render = RENDER_BACKENDS[backend or RENDER_BACKEND]
+        if output_mode == "hls":
+            render_progressive(render, audio_file_path, timed_captions, background_clips, output_file, fps, preset,
+                               on_event)
+        elif output_mode == "mp4":
+            render(audio_file_path, timed_captions, background_clips, output_file, fps, preset, on_event)
+        else:
+            raise ValueError(f"Unknown render output mode '{output_mode}'. Available: mp4, hls")
+    finally:
+        # Clean up downloaded video files
+        for video_filename in downloaded_video_files:
+            try:
+                if os.path.exists(video_filename):
+                    os.remove(video_filename)
+            except Exception as e:
+                print(f"Warning: Could not delete temporary file {video_filename}: {e}")
+
+    return output_file
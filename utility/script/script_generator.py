@@ -1,17 +1,6 @@
-import os
-from openai import OpenAI
 import json
-
-if len(os.environ.get("GROQ_API_KEY")) > 30:
-    from groq import Groq
-    model = "moonshotai/kimi-k2-instruct-0905"
-    client = Groq(
-        api_key=os.environ.get("GROQ_API_KEY"),
-        )
-else:
-    OPENAI_API_KEY = os.getenv('OPENAI_KEY')
-    model = "gpt-4o"
-    client = OpenAI(api_key=OPENAI_API_KEY)
+from utility.tracing import count, span
+from utility.utils import get_llm_client
 
 def generate_script(topic):
     prompt = (
@@ -42,20 +31,80 @@ def generate_script(topic):
         """
     )
 
-    response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": topic}
-            ]
-        )
+    client, model = get_llm_client()
+    with span("llm.script", model=model):
+        response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": topic}
+                ]
+            )
+    count("llm_prompt_chars", len(prompt) + len(topic), call="script")
     content = response.choices[0].message.content
+    script = parse_script_response(content)["script"]
+    return script
+
+def parse_script_response(content):
+    """Parse the JSON object returned by the script prompt, tolerating extra text around it"""
     try:
-        script = json.loads(content)["script"]
+        return json.loads(content)
     except Exception as e:
         json_start_index = content.find('{')
         json_end_index = content.rfind('}')
         print(content)
         content = content[json_start_index:json_end_index+1]
-        script = json.loads(content)["script"]
-    return script
+        return json.loads(content)
+
+def generate_script_with_keywords(topic):
+    """Generate the script and the per-sentence search keywords in a single LLM call.
+
+    Returns (script, sentences) where sentences is a list of
+    {"text": ..., "keywords": [...]} in narration order. The keywords are mapped
+    onto the caption timeline later by mapKeywordsToCaptions, so the second
+    keyword request with the full timed captions is not needed.
+    """
+    prompt = (
+        """You are a seasoned content writer for a YouTube Shorts channel, specializing in facts videos. 
+        Your facts shorts are concise, each lasting less than 50 seconds (approximately 140 words). 
+        They are incredibly engaging and original. When a user requests a specific type of facts short, you will create it.
+
+        Write the script as a list of sentences in narration order. For every sentence, also give three visually
+        concrete and specific keywords that can be used to search for a background video for that sentence.
+
+        Keyword guidelines:
+        Use only English in your keywords.
+        Each keyword must depict something visual, like 'rainy street' or 'cat sleeping'.
+        'emotional moment' <= BAD, because it doesn't depict something visually.
+        'crying child' <= GOOD, because it depicts something visual.
+        If a keyword is a single word, try to return a two-word keyword that is visually concrete.
+
+        Keep it brief, highly interesting, and unique.
+
+        Stictly output the script in a JSON format like below, and only provide a parsable JSON object with the key 'script'.
+
+        # Output
+        {"script": [{"text": "First sentence ...", "keywords": ["keyword1", "keyword2", "keyword3"]}, {"text": "Second sentence ...", "keywords": ["keyword4", "keyword5", "keyword6"]}]}
+        """
+    )
+
+    client, model = get_llm_client()
+    with span("llm.script_with_keywords", model=model):
+        response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": topic}
+                ]
+            )
+    count("llm_prompt_chars", len(prompt) + len(topic), call="script_with_keywords")
+    content = response.choices[0].message.content
+    sentences = []
+    for item in parse_script_response(content)["script"]:
+        text = str(item.get("text", "")).strip()
+        if not text:
+            continue
+        keywords = [str(keyword) for keyword in item.get("keywords", []) if str(keyword).strip()]
+        sentences.append({"text": text, "keywords": keywords[:3]})
+    script = " ".join(sentence["text"] for sentence in sentences)
+    return script, sentences
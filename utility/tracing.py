@@ -0,0 +1,228 @@
+"""Lightweight pipeline tracing and metrics.
+
+Spans are recorded per job into the active Trace (see start_trace) and exported
+as one JSON file per job. Every span and counter is also folded into
+process-wide totals that a long-running server can expose in the Prometheus
+text format with start_metrics_server.
+
+    with start_trace() as trace:
+        with span("script"):
+            ...
+        count("cache_hits", source="pexels")
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+TRACE_DIRECTORY = os.environ.get("TRACE_DIR", ".logs/traces")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Process-wide totals: {(metric_name, ((label, value), ...)): number}
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+# Process-wide gauges read at export time: {metric_name: callable returning a number}
+_gauges = {}
+
+
+class Trace:
+    """Spans and counters recorded for one pipeline job"""
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id or "{}_{}".format(time.strftime("%Y%m%d_%H%M%S"), uuid.uuid4().hex[:8])
+        self.started_at = time.time()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def add_count(self, key, value):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def stage_durations(self):
+        """Duration in seconds of each top-level span, keyed by name"""
+        durations = {}
+        for record in self.spans:
+            if record["parent_id"] is None:
+                durations[record["name"]] = durations.get(record["name"], 0) + record["duration"]
+        return durations
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "started_at": self.started_at,
+                "duration": time.time() - self.started_at,
+                "spans": sorted(self.spans, key=lambda record: record["start"]),
+                "counters": dict(self.counters),
+            }
+
+    def write(self, directory=TRACE_DIRECTORY):
+        """Write the trace as JSON and return the file path"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "{}.json".format(self.job_id))
+        with open(path, "w") as outfile:
+            json.dump(self.to_dict(), outfile, indent=2, default=str)
+        return path
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(job_id=None):
+    """Make a new Trace the active one for the enclosed pipeline run"""
+    trace = Trace(job_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def _counter_key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def count(name, value=1, **labels):
+    """Add value to a counter, e.g. count("bytes_downloaded", 1024, source="pexels")"""
+    key = _counter_key(name, labels)
+    with _metrics_lock:
+        _metrics[key] = _metrics.get(key, 0) + value
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(_format_series(*key), value)
+
+
+def add_span(name, start, duration, **attributes):
+    """Record a span that was timed by the caller (e.g. across generator yields)"""
+    parent = _current_span.get()
+    record = {
+        "id": uuid.uuid4().hex[:16],
+        "parent_id": parent["id"] if parent else None,
+        "name": name,
+        "start": start,
+        "duration": duration,
+        "attributes": attributes,
+    }
+    _finish(record)
+    return record
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as a child of the current span.
+
+    Yields the attribute dict so the block can attach results such as byte counts.
+    """
+    parent = _current_span.get()
+    record = {
+        "id": uuid.uuid4().hex[:16],
+        "parent_id": parent["id"] if parent else None,
+        "name": name,
+        "start": time.time(),
+        "duration": None,
+        "attributes": attributes,
+    }
+    token = _current_span.set(record)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = "{}: {}".format(type(e).__name__, e)
+        raise
+    finally:
+        record["duration"] = time.perf_counter() - started
+        _current_span.reset(token)
+        _finish(record)
+
+
+def _finish(record):
+    with _metrics_lock:
+        for suffix, value in (("_seconds_sum", record["duration"]), ("_seconds_count", 1)):
+            key = _counter_key("span" + suffix, {"span": record["name"]})
+            _metrics[key] = _metrics.get(key, 0) + value
+        if "error" in record["attributes"]:
+            key = _counter_key("span_errors", {"span": record["name"]})
+            _metrics[key] = _metrics.get(key, 0) + 1
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(record)
+
+
+def traced_sleep(seconds, reason):
+    """time.sleep that is visible in the trace and the sleep_seconds counter"""
+    with span("sleep", reason=reason, seconds=seconds):
+        time.sleep(seconds)
+    count("sleep_seconds", seconds, reason=reason)
+
+
+def register_gauge(name, read):
+    """Export read() as a Prometheus gauge, e.g. a queue depth"""
+    _gauges[name] = read
+
+
+def _format_series(name, labels):
+    if not labels:
+        return name
+    return "{}{{{}}}".format(name, ",".join('{}="{}"'.format(key, value) for key, value in labels))
+
+
+def render_prometheus(prefix="text_to_video_"):
+    """Process-wide counters and gauges in the Prometheus text exposition format"""
+    with _metrics_lock:
+        items = sorted(_metrics.items())
+    lines = []
+    seen = set()
+    for (name, labels), value in items:
+        if name not in seen:
+            seen.add(name)
+            lines.append("# TYPE {}{} counter".format(prefix, name))
+        lines.append("{}{} {}".format(prefix, _format_series(name, labels), value))
+    for name, read in sorted(_gauges.items()):
+        lines.append("# TYPE {}{} gauge".format(prefix, name))
+        lines.append("{}{} {}".format(prefix, name, read()))
+    return "\n".join(lines) + "\n"
+
+
+_metrics_server = None
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve render_prometheus() on /metrics from a daemon thread (idempotent)"""
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    _metrics_server.daemon_threads = True
+    threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics available at http://{host}:{port}/metrics")
+    return _metrics_server
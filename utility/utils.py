@@ -1,6 +1,11 @@
 import os
 from datetime import datetime
+import atexit
+import collections
 import json
+import queue
+import random
+import threading
 
 # Log types
 LOG_TYPE_GPT = "GPT"
@@ -10,25 +15,163 @@ LOG_TYPE_PEXEL = "PEXEL"
 DIRECTORY_LOG_GPT = ".logs/gpt_logs"
 DIRECTORY_LOG_PEXEL = ".logs/pexel_logs"
 
+# Groq keys are longer than this; shorter or missing values select OpenAI
+GROQ_KEY_MIN_LENGTH = 30
+
+_llm_client = None
+
+def get_llm_client():
+    """Return (client, model), creating the Groq or OpenAI client on first use.
+
+    Building the client at import time made every import pay for the SDK and
+    failed outright when GROQ_API_KEY was unset.
+    """
+    global _llm_client
+    if _llm_client is None:
+        if len(os.environ.get("GROQ_API_KEY") or "") > GROQ_KEY_MIN_LENGTH:
+            from groq import Groq
+            _llm_client = (Groq(api_key=os.environ.get("GROQ_API_KEY")), "moonshotai/kimi-k2-instruct-0905")
+        else:
+            from openai import OpenAI
+            _llm_client = (OpenAI(api_key=os.environ.get('OPENAI_KEY')), "gpt-4o")
+    return _llm_client
+
+# API response logs: append-only JSONL files rotated at LOG_MAX_BYTES, written by a background thread
+LOG_FILES = {
+    LOG_TYPE_GPT: os.path.join(DIRECTORY_LOG_GPT, "gpt.jsonl"),
+    LOG_TYPE_PEXEL: os.path.join(DIRECTORY_LOG_PEXEL, "pexel.jsonl"),
+}
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 1000))
+# Responses longer than this many characters of JSON are cut (0 keeps them whole)
+LOG_MAX_RESPONSE_CHARS = int(os.environ.get('LOG_MAX_RESPONSE_CHARS', 0))
+# Fraction of responses that are logged at all
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+
+
+class JsonlLogWriter:
+    """Bounded queue drained by a daemon thread that appends JSON lines to rotated files.
+
+    write() never blocks: when the queue is full the entry is dropped and
+    counted, so logging cannot slow down a search.
+    """
+
+    def __init__(self, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, queue_size=LOG_QUEUE_SIZE,
+                 max_response_chars=LOG_MAX_RESPONSE_CHARS):
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_response_chars = max_response_chars
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, path, entry):
+        self._start()
+        try:
+            self._queue.put_nowait((path, entry))
+        except queue.Full:
+            self.dropped += 1
+            from utility.tracing import count
+            count("log_entries_dropped")
+
+    def flush(self):
+        """Block until every queued entry is on disk"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="jsonl-log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            path, entry = self._queue.get()
+            try:
+                self._append(path, self._serialize(entry))
+                if self._queue.empty():
+                    for outfile in self._files.values():
+                        outfile.flush()
+            except Exception as e:
+                print(f"Warning: Could not write log entry to {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _serialize(self, entry):
+        if self.max_response_chars:
+            response = json.dumps(entry["response"], default=str)
+            if len(response) > self.max_response_chars:
+                # Cut responses are stored as a JSON string prefix; truncated holds the full length
+                entry = dict(entry, response=response[:self.max_response_chars], truncated=len(response))
+        return json.dumps(entry, default=str) + "\n"
+
+    def _append(self, path, line):
+        outfile = self._files.get(path)
+        if outfile is None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            outfile = self._files[path] = open(path, "a")
+        if self.max_bytes and outfile.tell() and outfile.tell() + len(line) > self.max_bytes:
+            outfile.close()
+            self._rotate(path)
+            outfile = self._files[path] = open(path, "a")
+        outfile.write(line)
+
+    def _rotate(self, path):
+        # path -> path.1 -> path.2 ... keeping backup_count old files
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists("{}.{}".format(path, index)):
+                os.replace("{}.{}".format(path, index), "{}.{}".format(path, index + 1))
+        if self.backup_count:
+            os.replace(path, path + ".1")
+        else:
+            os.remove(path)
+
+
+_log_writer = None
+
+
+def get_log_writer():
+    global _log_writer
+    if _log_writer is None:
+        _log_writer = JsonlLogWriter()
+    return _log_writer
+
+
 # method to log response from pexel and openai
 def log_response(log_type, query,response):
+    if log_type not in LOG_FILES or (LOG_SAMPLE_RATE < 1 and random.random() >= LOG_SAMPLE_RATE):
+        return
     log_entry = {
         "query": query,
         "response": response,
         "timestamp": datetime.now().isoformat()
     }
-    if log_type == LOG_TYPE_GPT:
-        if not os.path.exists(DIRECTORY_LOG_GPT):
-            os.makedirs(DIRECTORY_LOG_GPT)
-        filename = '{}_gpt3.txt'.format(datetime.now().strftime("%Y%m%d_%H%M%S"))
-        filepath = os.path.join(DIRECTORY_LOG_GPT, filename)
-        with open(filepath, "w") as outfile:
-            outfile.write(json.dumps(log_entry) + '\n')
-
-    if log_type == LOG_TYPE_PEXEL:
-        if not os.path.exists(DIRECTORY_LOG_PEXEL):
-            os.makedirs(DIRECTORY_LOG_PEXEL)
-        filename = '{}_pexel.txt'.format(datetime.now().strftime("%Y%m%d_%H%M%S"))
-        filepath = os.path.join(DIRECTORY_LOG_PEXEL, filename)
-        with open(filepath, "w") as outfile:
-            outfile.write(json.dumps(log_entry) + '\n')
+    get_log_writer().write(LOG_FILES[log_type], log_entry)
+
+
+def read_log(log_type, limit=None):
+    """Logged entries for a log type, oldest first, across rotated files.
+
+    With limit, only the most recent entries are returned. Queued entries are
+    flushed first so a process can read back what it just logged.
+    """
+    if _log_writer is not None:
+        _log_writer.flush()
+    path = LOG_FILES[log_type]
+    paths = ["{}.{}".format(path, index) for index in range(LOG_BACKUP_COUNT, 0, -1)] + [path]
+    entries = collections.deque(maxlen=limit)
+    for log_path in paths:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path) as infile:
+            for line in infile:
+                if line.strip():
+                    entries.append(json.loads(line))
+    return list(entries)
@@ -2,10 +2,15 @@ import os
 import requests
 import time
 import hashlib
+from utility.progress import report_progress
+from utility.video.footage_index import get_footage_index
+from utility.video.footage_providers import FootageProvider, get_footage_provider
+from utility.tracing import count, span, traced_sleep
 from utility.utils import log_response,LOG_TYPE_PEXEL
 
 PEXELS_API_KEY = os.environ.get('PEXELS_KEY')
-REQUEST_DELAY = 0.5  # Delay between requests in seconds (500ms)
+PEXELS_API_URL = os.environ.get('PEXELS_API_URL', "https://api.pexels.com/videos/search")
+REQUEST_DELAY = float(os.environ.get('PEXELS_REQUEST_DELAY', 0.5))  # Delay between requests in seconds (500ms)
 
 # Simple in-memory cache for API responses
 _api_cache = {}
@@ -19,9 +24,10 @@ def search_videos(query_string, orientation_landscape=True):
     # Check cache first
     if cache_key in _api_cache:
         print(f"🔄 Using cached result for query: '{query_string}'")
+        count("cache_hits", source="pexels")
         return _api_cache[cache_key]
    
-    url = "https://api.pexels.com/videos/search"
+    url = PEXELS_API_URL
     headers = {
         "Authorization": PEXELS_API_KEY,
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
@@ -33,7 +39,7 @@ def search_videos(query_string, orientation_landscape=True):
     }
 
     # Add delay to avoid rate limiting
-    time.sleep(REQUEST_DELAY)
+    traced_sleep(REQUEST_DELAY, "pexels_throttle")
     
     # Retry logic with exponential backoff
     max_retries = 3
@@ -42,14 +48,20 @@ def search_videos(query_string, orientation_landscape=True):
     
     while retry_count < max_retries:
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            with span("pexels.search", query=query_string, attempt=retry_count + 1) as attributes:
+                response = requests.get(url, headers=headers, params=params, timeout=10)
+                attributes["status"] = response.status_code
+                attributes["bytes"] = len(response.content)
+            count("api_calls", source="pexels")
+            count("bytes_received", len(response.content), source="pexels")
             
             # Check for HTTP errors
             if response.status_code == 429:  # Too Many Requests
                 retry_count += 1
                 if retry_count < max_retries:
                     print(f"Rate limited (429). Retrying in {retry_delay} seconds... (Attempt {retry_count}/{max_retries})")
-                    time.sleep(retry_delay)
+                    count("retries", source="pexels", reason="rate_limit")
+                    traced_sleep(retry_delay, "pexels_backoff")
                     retry_delay *= 2  # Exponential backoff: 2s, 4s, 8s
                     continue
                 else:
@@ -65,17 +77,21 @@ def search_videos(query_string, orientation_landscape=True):
                 _api_cache[cache_key] = result
                 return result
             
-            # Success - cache and return
+            # Success - cache, index and return
             json_data = response.json()
             _api_cache[cache_key] = json_data
-            log_response(LOG_TYPE_PEXEL, query_string, response.json())
+            footage_index = get_footage_index()
+            if footage_index is not None:
+                footage_index.add_response(query_string, json_data)
+            log_response(LOG_TYPE_PEXEL, query_string, json_data)
             return json_data
             
         except requests.exceptions.Timeout:
             retry_count += 1
             if retry_count < max_retries:
                 print(f"Request timeout. Retrying in {retry_delay} seconds... (Attempt {retry_count}/{max_retries})")
-                time.sleep(retry_delay)
+                count("retries", source="pexels", reason="timeout")
+                traced_sleep(retry_delay, "pexels_backoff")
                 retry_delay *= 2
             else:
                 print("ERROR: Request timeout after max retries")
@@ -93,90 +109,166 @@ def search_videos(query_string, orientation_landscape=True):
     return result
 
 
-def getBestVideo(query_string, orientation_landscape=True, used_vids=[]):
-    vids = search_videos(query_string, orientation_landscape)
-    
-    # Check if the API response contains the expected 'videos' key
-    if 'videos' not in vids:
-        error_msg = vids.get('error', 'Unknown error from Pexels API')
-        print(f"ERROR: Pexels API returned error: {error_msg}")
-        print(f"Full response: {vids}")
-        return None
-    
-    videos = vids['videos']  # Extract the videos list from JSON
-
-    # Filter and extract videos with width and height as 1920x1080 for landscape or 1080x1920 for portrait
-    if orientation_landscape:
-        filtered_videos = [video for video in videos if video['width'] >= 1920 and video['height'] >= 1080 and video['width']/video['height'] == 16/9]
-    else:
-        filtered_videos = [video for video in videos if video['width'] >= 1080 and video['height'] >= 1920 and video['height']/video['width'] == 16/9]
-
-    # Sort the filtered videos by duration in ascending order
-    sorted_videos = sorted(filtered_videos, key=lambda x: abs(15-int(x['duration'])))
-
-    # Extract the top 3 videos' URLs
-    for video in sorted_videos:
-        for video_file in video['video_files']:
-            if orientation_landscape:
-                if video_file['width'] == 1920 and video_file['height'] == 1080:
-                    if not (video_file['link'].split('.hd')[0] in used_vids):
-                        return video_file['link']
-            else:
-                if video_file['width'] == 1080 and video_file['height'] == 1920:
-                    if not (video_file['link'].split('.hd')[0] in used_vids):
-                        return video_file['link']
-    print("NO LINKS found for this round of search with query :", query_string)
-    return None
+class PexelsProvider(FootageProvider):
+    """Pexels video search, answered from the local footage index when possible"""
+
+    name = "pexels"
+
+    def search(self, query, orientation_landscape=True, exclude=()):
+        # Answer from the local footage index first; the API is only needed on a miss
+        footage_index = get_footage_index()
+        if footage_index is not None:
+            with span("footage_index.search", query=query) as attributes:
+                local_videos = footage_index.search(query, orientation_landscape)
+                attributes["results"] = len(local_videos)
+            # The index already ranks by text match, then duration fit
+            candidates = unusedCandidates(rankPexelsVideos(local_videos, orientation_landscape, sort_by_duration=False),
+                                          exclude)
+            if candidates:
+                print(f"📚 Using local footage index for query: '{query}'")
+                count("cache_hits", source="footage_index")
+                return candidates
+            count("cache_misses", source="footage_index")
+
+        candidates = unusedCandidates(searchCandidates(query, orientation_landscape), exclude)
+        if not candidates:
+            print("NO LINKS found for this round of search with query :", query)
+        return candidates
+
+    def summary(self):
+        return f"Made {len(_api_cache)} unique API calls with caching and reuse"
+
+
+# Rendition size we aim for, by orientation_landscape
+TARGET_PROFILES = {True: (1920, 1080), False: (1080, 1920)}
+# Relative aspect-ratio error still accepted as 16:9 (Pexels sizes are often a few pixels off)
+ASPECT_TOLERANCE = 0.02
+
+# Ranked candidates per API response, keyed like _api_cache
+_candidate_cache = {}
+
+
+def searchCandidates(query_string, orientation_landscape=True):
+    """Ranked candidates for a Pexels API search, computed once per query"""
+    cache_key = hashlib.md5(f"{query_string}_{orientation_landscape}".encode()).hexdigest()
+    if cache_key not in _candidate_cache:
+        vids = search_videos(query_string, orientation_landscape)
+        
+        # Check if the API response contains the expected 'videos' key
+        if 'videos' not in vids:
+            error_msg = vids.get('error', 'Unknown error from Pexels API')
+            print(f"ERROR: Pexels API returned error: {error_msg}")
+            print(f"Full response: {vids}")
+            return []
+        
+        _candidate_cache[cache_key] = rankPexelsVideos(vids['videos'], orientation_landscape)
+    return _candidate_cache[cache_key]
+
 
+def unusedCandidates(candidates, exclude):
+    """Candidates whose id is not in exclude (a set of ids already used by the job)"""
+    return [candidate for candidate in candidates if candidate["id"] not in exclude]
 
-def generate_video_url(timed_video_searches, video_server):
-    """Generate video URLs with smart keyword selection and video reuse"""
+
+def bestRendition(video_files, orientation_landscape=True):
+    """File of a video closest in size to the target profile with a matching aspect ratio, or None"""
+    target_width, target_height = TARGET_PROFILES[orientation_landscape]
+    best = None
+    for video_file in video_files:
+        width, height = video_file.get('width'), video_file.get('height')
+        # Pexels lists HLS playlists without dimensions
+        if not width or not height or abs(width / height / (target_width / target_height) - 1) > ASPECT_TOLERANCE:
+            continue
+        # Nearest height wins; on a tie prefer the larger file over upscaling
+        key = (abs(height - target_height), -height)
+        if best is None or key < best[0]:
+            best = (key, video_file)
+    return best[1] if best else None
+
+
+def rankPexelsVideos(videos, orientation_landscape=True, sort_by_duration=True):
+    """Candidates for Pexels-style video results, one per video with its best rendition.
+
+    Videos that reach the target resolution come first, each group ordered by
+    how close the clip is to 15 seconds (or kept in input order when
+    sort_by_duration is False). Renditions of other sizes are scaled and
+    cropped to the output size by render_engine.fit_clip.
+    """
+    target_width, target_height = TARGET_PROFILES[orientation_landscape]
+    candidates = []
+    for video in videos:
+        video_file = bestRendition(video['video_files'], orientation_landscape)
+        if video_file is None:
+            continue
+        candidates.append({"id": "pexels:{}".format(video['id']), "asset": video_file['link'],
+                           "provider": "pexels", "duration": video['duration'],
+                           "width": video_file['width'], "height": video_file['height']})
+
+    def rank(candidate):
+        below_target = candidate["height"] < target_height
+        return (below_target, abs(15 - int(candidate["duration"] or 0)) if sort_by_duration else 0)
+
+    return sorted(candidates, key=rank)
+
+
+def generate_video_url(timed_video_searches, video_server, on_event=None):
+    """Generate video URLs with smart keyword selection and video reuse.
+
+    Footage comes from the provider registered for video_server (see
+    utility.video.footage_providers). timed_video_searches may be a list or a
+    generator such as iterVideoSearchQueriesTimed, in which case searching
+    starts with the first segment while the rest are still being generated.
+    Per-segment progress is reported to on_event (see utility.progress).
+    """
+    provider = get_footage_provider(video_server)
     timed_video_urls = []
-    if video_server == "pexel":
-        used_links = []
-        total_searches = len(timed_video_searches)
-        last_found_url = None  # Reuse videos for consecutive segments
-        reuse_count = 0
-        REUSE_LIMIT = 2  # Reuse each video for up to 2-3 segments
+    used_links = set()  # Candidate ids already placed in this job
+    # Streamed searches arrive one segment at a time, so the total may be unknown
+    total_searches = len(timed_video_searches) if hasattr(timed_video_searches, '__len__') else '?'
+    last_found_url = None  # Reuse videos for consecutive segments
+    reuse_count = 0
+    REUSE_LIMIT = 2  # Reuse each video for up to 2-3 segments
+    
+    started = time.perf_counter()
+    for idx, (time_interval, search_terms) in enumerate(timed_video_searches):
+        t1, t2 = time_interval
+        report_progress(on_event, "footage", idx, total_searches if total_searches != '?' else None, started,
+                        f"Finding background video for {t1}-{t2}s")
+        url = None
+        attempted_queries = []
         
-        for idx, (time_interval, search_terms) in enumerate(timed_video_searches):
-            t1, t2 = time_interval
-            url = None
-            attempted_queries = []
-            
-            # Check if we should reuse the last video
-            if last_found_url and reuse_count < REUSE_LIMIT:
-                url = last_found_url
-                reuse_count += 1
-                print(f"[{idx+1}/{total_searches}] ♻️  Reusing video (Segment {reuse_count}/{REUSE_LIMIT})")
-            else:
-                # Try each keyword, but be smart about it
-                for query in search_terms:
-                    attempted_queries.append(query)
-                    print(f"[{idx+1}/{total_searches}] Searching for: '{query}' (Time: {t1}-{t2}s)")
-                    
-                    url = getBestVideo(query, orientation_landscape=True, used_vids=used_links)
-                    if url:
-                        print(f"  ✅ Found video for '{query}'")
-                        used_links.append(url.split('.hd')[0])
-                        last_found_url = url
-                        reuse_count = 0  # Reset reuse counter
-                        break
-                    else:
-                        print(f"  ❌ No video found for '{query}'")
+        # Check if we should reuse the last video
+        if last_found_url and reuse_count < REUSE_LIMIT:
+            url = last_found_url
+            reuse_count += 1
+            count("footage_reuse", source=provider.name)
+            print(f"[{idx+1}/{total_searches}] ♻️  Reusing video (Segment {reuse_count}/{REUSE_LIMIT})")
+        else:
+            # Try each keyword, but be smart about it
+            for query in search_terms:
+                attempted_queries.append(query)
+                print(f"[{idx+1}/{total_searches}] Searching for: '{query}' (Time: {t1}-{t2}s)")
                 
-                if url is None and attempted_queries:
-                    print(f"⚠️  Warning: No video found for any of these queries: {attempted_queries}")
-                    # Fallback: reuse last found video if available
-                    if last_found_url:
-                        url = last_found_url
-                        print(f"  Using fallback: last found video")
-            
-            timed_video_urls.append([[t1, t2], url])
+                candidates = provider.search(query, orientation_landscape=True, exclude=used_links)
+                if candidates:
+                    url = candidates[0]["asset"]
+                    print(f"  ✅ Found video for '{query}'")
+                    used_links.add(candidates[0]["id"])
+                    last_found_url = url
+                    reuse_count = 0  # Reset reuse counter
+                    break
+                else:
+                    print(f"  ❌ No video found for '{query}'")
             
-        print(f"\n📊 Summary: Made {len(_api_cache)} unique API calls with caching and reuse")
+            if url is None and attempted_queries:
+                print(f"⚠️  Warning: No video found for any of these queries: {attempted_queries}")
+                # Fallback: reuse last found video if available
+                if last_found_url:
+                    url = last_found_url
+                    print(f"  Using fallback: last found video")
+        
+        timed_video_urls.append([[t1, t2], url])
         
-    elif video_server == "stable_diffusion":
-        timed_video_urls = get_images_for_video(timed_video_searches)
+    print(f"\n📊 Summary: {provider.summary()}")
 
     return timed_video_urls
@@ -0,0 +1,152 @@
+"""Local searchable index of stock-footage search results.
+
+Every Pexels response is added to a SQLite database (FTS5 when available) keyed
+by video id, with searchable text taken from the URL slug and the queries that
+returned the video. PexelsProvider.search asks the index first and only calls the API
+when the index has nothing usable, so repeat and overlapping queries are
+answered from disk. Set FOOTAGE_INDEX_PATH to an empty string to disable it.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+FOOTAGE_INDEX_PATH = os.environ.get('FOOTAGE_INDEX_PATH', ".cache/footage_index.sqlite3")
+
+# Preferred clip length in seconds, same target as the Pexels ranking in rankPexelsVideos
+TARGET_DURATION = 15
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    url TEXT,
+    tags TEXT NOT NULL,
+    queries TEXT NOT NULL DEFAULT '',
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    video_files TEXT NOT NULL,
+    updated_at REAL
+);
+"""
+
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def slug_tags(url):
+    """Words of a Pexels video URL slug: .../video/man-walking-a-dog-123/ -> 'man walking a dog'"""
+    slug = (url or "").rstrip("/").rsplit("/", 1)[-1]
+    return " ".join(token for token in _tokens(slug) if not token.isdigit())
+
+
+class FootageIndex:
+    """SQLite index of video search results; safe to share between threads"""
+
+    def __init__(self, path=FOOTAGE_INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(tags, queries)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: fall back to LIKE matching on the videos table
+            self.fts = False
+        self._db.commit()
+
+    def add_response(self, query, response, provider="pexels"):
+        """Index every video of a search response, remembering the query that found it"""
+        videos = response.get("videos") or []
+        with self._lock, self._db:
+            for video in videos:
+                self._add(video, slug_tags(video.get("url")), provider, query)
+        return len(videos)
+
+    def add_video(self, video, tags, provider, updated_at=None):
+        """Index one video in the Pexels layout with explicit searchable tags"""
+        with self._lock, self._db:
+            self._add(video, tags, provider, None, updated_at)
+
+    def updated_at(self):
+        """{video id: updated_at} for every indexed video"""
+        with self._lock:
+            return dict(self._db.execute("SELECT id, updated_at FROM videos").fetchall())
+
+    def remove(self, video_ids):
+        """Delete videos and their search entries; returns how many were removed"""
+        video_ids = [(video_id,) for video_id in video_ids]
+        with self._lock, self._db:
+            removed = self._db.executemany("DELETE FROM videos WHERE id = ?", video_ids).rowcount
+            if self.fts:
+                self._db.executemany("DELETE FROM videos_fts WHERE rowid = ?", video_ids)
+        return removed
+
+    def _add(self, video, tags, provider, query, updated_at=None):
+        """Upsert one video; callers hold the lock and the transaction"""
+        row = self._db.execute("SELECT queries FROM videos WHERE id = ?", (video["id"],)).fetchone()
+        queries = set((row[0] if row else "").split("\n")) - {""}
+        if query:
+            queries.add(query.lower())
+        self._db.execute(
+            "INSERT OR REPLACE INTO videos (id, provider, url, tags, queries, duration, width, height,"
+            " video_files, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (video["id"], provider, video.get("url"), tags, "\n".join(sorted(queries)),
+             video.get("duration"), video.get("width"), video.get("height"),
+             json.dumps(video.get("video_files", [])), updated_at or time.time()))
+        if self.fts:
+            self._db.execute("DELETE FROM videos_fts WHERE rowid = ?", (video["id"],))
+            self._db.execute("INSERT INTO videos_fts (rowid, tags, queries) VALUES (?, ?, ?)",
+                             (video["id"], tags, " ".join(sorted(queries))))
+
+    def search(self, query, orientation_landscape=True, limit=15, match_all=True):
+        """Videos matching every word of query, best text match first, then closest to TARGET_DURATION.
+
+        With match_all=False any word is enough. Results use the Pexels video
+        layout (id, url, duration, width, height, video_files).
+        """
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        orientation = "width >= height" if orientation_landscape else "height > width"
+        with self._lock:
+            if self.fts:
+                match = (" " if match_all else " OR ").join('"{}"'.format(token) for token in tokens)
+                rows = self._db.execute(
+                    "SELECT v.id, v.url, v.duration, v.width, v.height, v.video_files FROM videos_fts"
+                    " JOIN videos v ON v.id = videos_fts.rowid"
+                    " WHERE videos_fts MATCH ? AND " + orientation +
+                    " ORDER BY round(bm25(videos_fts), 1), abs(? - v.duration) LIMIT ?",
+                    (match, TARGET_DURATION, limit)).fetchall()
+            else:
+                conditions = (" AND " if match_all else " OR ").join(
+                    ["(' ' || tags || ' ' || queries || ' ') LIKE ?"] * len(tokens))
+                conditions = "(" + conditions + ")"
+                rows = self._db.execute(
+                    "SELECT id, url, duration, width, height, video_files FROM videos WHERE " + conditions +
+                    " AND " + orientation + " ORDER BY abs(? - duration) LIMIT ?",
+                    ["%{}%".format(token) for token in tokens] + [TARGET_DURATION, limit]).fetchall()
+        return [{"id": row[0], "url": row[1], "duration": row[2], "width": row[3], "height": row[4],
+                 "video_files": json.loads(row[5])} for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM videos").fetchone()[0]
+
+
+_footage_index = None
+
+
+def get_footage_index():
+    """Process-wide FootageIndex, or None when FOOTAGE_INDEX_PATH is empty"""
+    global _footage_index
+    if _footage_index is None and FOOTAGE_INDEX_PATH:
+        _footage_index = FootageIndex(FOOTAGE_INDEX_PATH)
+    return _footage_index
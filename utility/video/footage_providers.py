@@ -0,0 +1,274 @@
+"""Footage providers: search -> ranked candidates -> fetchable asset.
+
+A provider turns a keyword into ranked candidates and turns a candidate's asset
+into a local file the render engine can open. Candidates are dicts:
+
+    {"id": "...", "asset": "<url or local path>", "provider": "pexels",
+     "duration": 12.0, "width": 1920, "height": 1080}
+
+"id" is what generate_video_url uses to avoid picking the same footage twice.
+Providers are looked up by the video_server name used throughout the pipeline
+("pexel" for Pexels, "local" for a folder of our own footage).
+"""
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import tempfile
+import requests
+from utility.tracing import count, span
+from utility.video.footage_index import FootageIndex
+
+FOOTAGE_LIBRARY_DIR = os.environ.get('FOOTAGE_LIBRARY_DIR', "footage")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".webm", ".mkv")
+
+# Remote clips are cut to the seconds a segment needs (plus TRIM_MARGIN) while downloading
+TRIMMED_FETCH = os.environ.get('FOOTAGE_TRIMMED_FETCH', "1").lower() not in ("0", "false", "no")
+TRIM_MARGIN = 1.0
+# Top-level MP4 boxes inspected when looking for moov before mdat
+MAX_PROBED_BOXES = 16
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+
+def download_file(url, filename):
+    with open(filename, 'wb') as f, span("download", url=url) as attributes:
+        headers = {
+        "User-Agent": USER_AGENT
+        }
+        response = requests.get(url, headers=headers)
+        f.write(response.content)
+        attributes["bytes"] = len(response.content)
+    count("bytes_downloaded", len(response.content), source="footage")
+
+
+def is_seekable_mp4(url):
+    """True when url answers Range requests and its moov box comes before mdat.
+
+    Only then can ffmpeg read the first seconds of the clip without fetching
+    the whole file. Box headers are read with tiny ranged requests.
+    """
+    offset = 0
+    for _ in range(MAX_PROBED_BOXES):
+        with requests.get(url, headers={"User-Agent": USER_AGENT, "Range": "bytes={}-{}".format(offset, offset + 15)},
+                          stream=True, timeout=10) as response:
+            # A 200 means the server ignored the range; close without reading the body
+            if response.status_code != 206:
+                return False
+            header = response.raw.read(16)
+        count("bytes_downloaded", len(header), source="footage_probe")
+        if len(header) < 8:
+            return False
+        size, box = struct.unpack(">I4s", header[:8])
+        if size == 1 and len(header) >= 16:
+            size = struct.unpack(">Q", header[8:16])[0]
+        if box == b"moov":
+            return True
+        if box == b"mdat" or size < 8:
+            return False
+        offset += size
+    return False
+
+
+def ffmpeg_binary():
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return "ffmpeg"
+
+
+def download_window(url, seconds, filename):
+    """Copy the first seconds of a remote MP4 into filename (video only, no re-encode)"""
+    with span("download.trimmed", url=url, seconds=seconds) as attributes:
+        subprocess.run([ffmpeg_binary(), "-y", "-v", "error", "-user_agent", USER_AGENT, "-t", str(seconds),
+                        "-i", url, "-c", "copy", "-an", "-movflags", "+faststart", filename],
+                       check=True, capture_output=True)
+        attributes["bytes"] = os.path.getsize(filename)
+    count("bytes_downloaded", attributes["bytes"], source="footage_trimmed")
+
+
+class FootageProvider:
+    """Base class for footage sources"""
+
+    name = None
+
+    def search(self, query, orientation_landscape=True, exclude=()):
+        """Ranked candidates for query whose id is not in exclude, best first"""
+        raise NotImplementedError
+
+    def fetch(self, asset, seconds=None):
+        """Return (local_path, is_temporary) for a candidate's asset.
+
+        Local files are used in place; URLs are downloaded to a temporary file
+        that the caller deletes once it is done with it. With seconds, only
+        that much of the clip (from its start) is fetched when the server
+        supports it, otherwise the whole file is downloaded.
+        """
+        if asset.startswith("file://"):
+            asset = asset[len("file://"):]
+        if os.path.isfile(asset):
+            return asset, False
+        video_filename = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
+        try:
+            if seconds and TRIMMED_FETCH and self._fetch_window(asset, seconds + TRIM_MARGIN, video_filename):
+                return video_filename, True
+            download_file(asset, video_filename)
+        except Exception:
+            os.remove(video_filename)
+            raise
+        return video_filename, True
+
+    def _fetch_window(self, url, seconds, filename):
+        """Try a trimmed fetch; False means the caller should download the whole file"""
+        try:
+            if not is_seekable_mp4(url):
+                count("trimmed_fetch_fallbacks", reason="not_seekable")
+                return False
+            download_window(url, seconds, filename)
+            return True
+        except (requests.RequestException, subprocess.CalledProcessError, OSError) as e:
+            print(f"⚠️  Trimmed fetch failed, downloading the whole clip: {e}")
+            count("trimmed_fetch_fallbacks", reason="error")
+            return False
+
+    def summary(self):
+        """One-line usage summary printed after a job"""
+        return ""
+
+
+def probe_video(path):
+    """(duration, width, height) of a video file using ffprobe"""
+    try:
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries",
+             "stream=width,height:format=duration", "-of", "json", path], capture_output=True, text=True,
+            check=True).stdout
+    except OSError as e:
+        # imageio-ffmpeg only ships ffmpeg, so ffprobe has to come from a system FFmpeg install
+        raise FileNotFoundError(
+            f"ffprobe is required to index the footage library but could not be run ({e}). "
+            "Install FFmpeg (e.g. apt-get install ffmpeg) so ffprobe is on the PATH.") from e
+    info = json.loads(output)
+    stream = info["streams"][0]
+    return float(info["format"]["duration"]), int(stream["width"]), int(stream["height"])
+
+
+def sidecar_tags(path):
+    """Tags from a <name>.txt (free text) or <name>.json ({"tags": [...]}) file next to the video"""
+    base = os.path.splitext(path)[0]
+    tags = []
+    if os.path.exists(base + ".txt"):
+        with open(base + ".txt") as infile:
+            tags.append(infile.read())
+    if os.path.exists(base + ".json"):
+        with open(base + ".json") as infile:
+            tags.extend(json.load(infile).get("tags", []))
+    return " ".join(tags)
+
+
+class LocalLibraryProvider(FootageProvider):
+    """Serves footage from a local folder with zero network I/O.
+
+    The folder is indexed once into <folder>/.footage_index.sqlite3 (ffprobe
+    metadata plus filename and sidecar tags); later runs only probe new or
+    modified files and drop deleted ones.
+    """
+
+    name = "local"
+
+    def __init__(self, directory=FOOTAGE_LIBRARY_DIR):
+        self.directory = os.path.abspath(directory)
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"Footage library folder not found: {self.directory}")
+        self.index = FootageIndex(os.path.join(self.directory, ".footage_index.sqlite3"))
+        self.refresh()
+
+    @staticmethod
+    def video_id(path):
+        return int(hashlib.md5(path.encode()).hexdigest()[:15], 16)
+
+    def refresh(self):
+        """Index videos that are new or changed since the last refresh and drop the ones that are gone"""
+        known = self.index.updated_at()
+        found = set()
+        indexed = 0
+        with span("footage_library.refresh", directory=self.directory) as attributes:
+            for root, _, files in os.walk(self.directory):
+                for filename in sorted(files):
+                    if not filename.lower().endswith(VIDEO_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, filename)
+                    video_id = self.video_id(path)
+                    found.add(video_id)
+                    modified = os.path.getmtime(path)
+                    if known.get(video_id, 0) >= modified:
+                        continue
+                    try:
+                        duration, width, height = probe_video(path)
+                    except (subprocess.CalledProcessError, KeyError, IndexError, ValueError) as e:
+                        print(f"⚠️  Skipping unreadable footage {path}: {e}")
+                        continue
+                    tags = " ".join([os.path.relpath(os.path.splitext(path)[0], self.directory)
+                                     .replace(os.sep, " ").replace("_", " ").replace("-", " "), sidecar_tags(path)])
+                    video = {"id": video_id, "url": path, "duration": duration, "width": width, "height": height,
+                             "video_files": [{"link": path, "width": width, "height": height}]}
+                    self.index.add_video(video, tags, self.name, updated_at=modified)
+                    indexed += 1
+            removed = self.index.remove(set(known) - found)
+            attributes["indexed"] = indexed
+            attributes["removed"] = removed
+        if indexed:
+            print(f"📚 Indexed {indexed} new footage files in {self.directory}")
+        if removed:
+            print(f"📚 Removed {removed} deleted footage files from the index")
+
+    def search(self, query, orientation_landscape=True, exclude=()):
+        videos = self.index.search(query, orientation_landscape)
+        if not videos:
+            # Our own tags are sparser than stock footage slugs, so accept any matching word
+            videos = self.index.search(query, orientation_landscape, match_all=False)
+        return [{"id": "local:{}".format(video["id"]), "asset": video["url"], "provider": self.name,
+                 "duration": video["duration"], "width": video["width"], "height": video["height"]}
+                for video in videos
+                # Files deleted since the last refresh
+                if "local:{}".format(video["id"]) not in exclude and os.path.exists(video["url"])]
+
+    def fetch(self, asset, seconds=None):
+        return asset, False
+
+    def summary(self):
+        return f"Served footage from {len(self.index)} local files"
+
+
+def _pexels_provider():
+    # Imported lazily: the Pexels module imports this one for the base class
+    from utility.video.background_video_generator import PexelsProvider
+
+    return PexelsProvider()
+
+
+_provider_factories = {
+    "pexel": _pexels_provider,
+    "pexels": _pexels_provider,
+    "local": LocalLibraryProvider,
+}
+
+_providers = {}
+
+
+def register_footage_provider(name, factory):
+    """Register a provider factory under a video_server name"""
+    _provider_factories[name] = factory
+    _providers.pop(name, None)
+
+
+def get_footage_provider(video_server):
+    """Process-wide provider instance for a video_server name"""
+    if video_server not in _providers:
+        if video_server not in _provider_factories:
+            raise ValueError(f"Unknown video server '{video_server}'. Available: {sorted(_provider_factories)}")
+        _providers[video_server] = _provider_factories[video_server]()
+    return _providers[video_server]
@@ -1,20 +1,8 @@
-from openai import OpenAI
-import os
 import json
 import re
-from datetime import datetime
-from utility.utils import log_response,LOG_TYPE_GPT
-
-if len(os.environ.get("GROQ_API_KEY")) > 30:
-    from groq import Groq
-    model = "moonshotai/kimi-k2-instruct-0905"
-    client = Groq(
-        api_key=os.environ.get("GROQ_API_KEY"),
-        )
-else:
-    model = "gpt-4o"
-    OPENAI_API_KEY = os.environ.get('OPENAI_KEY')
-    client = OpenAI(api_key=OPENAI_API_KEY)
+import time
+from utility.tracing import add_span, count, span
+from utility.utils import get_llm_client,log_response,LOG_TYPE_GPT
 
 log_directory = ".logs/gpt_logs"
 
@@ -81,6 +69,8 @@ def getVideoSearchQueriesTimed(script,captions_timed):
         
         out = [[[0,0],""]]
         while out[-1][0][1] != end:
+            if out[-1][0][1] != 0:
+                count("retries", call="keywords")
             content = call_OpenAI(script,captions_timed).replace("'",'"')
             try:
                 out = json.loads(content)
@@ -117,14 +107,17 @@ Timed Captions:{}
 """.format(script,"".join(map(str,captions_timed)))
     print("Content", user_content)
     
-    response = client.chat.completions.create(
-        model= model,
-        temperature=1,
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": user_content}
-        ]
-    )
+    client, model = get_llm_client()
+    with span("llm.keywords", model=model):
+        response = client.chat.completions.create(
+            model= model,
+            temperature=1,
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": user_content}
+            ]
+        )
+    count("llm_prompt_chars", len(prompt) + len(user_content), call="keywords")
     
     text = response.choices[0].message.content.strip()
     text = re.sub(r'\s+', ' ', text)
@@ -132,6 +125,248 @@ Timed Captions:{}
     log_response(LOG_TYPE_GPT,script,text)
     return text
 
+# JSON schema for the streamed keyword response. Structured output needs an
+# object at the root, so segments are objects instead of [[t1, t2], [...]] pairs
+SEGMENTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "segments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "start": {"type": "number"},
+                    "end": {"type": "number"},
+                    "keywords": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["start", "end", "keywords"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["segments"],
+    "additionalProperties": False
+}
+
+stream_prompt_suffix = """
+Output format override: return a JSON object like {"segments": [{"start": t1, "end": t2, "keywords": ["keyword1", "keyword2", "keyword3"]}, {"start": t2, "end": t3, "keywords": ["keyword4", "keyword5", "keyword6"]}, ...]} with the segments in chronological order.
+"""
+
+class SegmentStreamParser:
+    """Incrementally parse a streamed JSON list of segments.
+
+    The first array in the stream is treated as the segment list, so both
+    {"segments": [...]} and the legacy [[[t1, t2], [...]], ...] layout work.
+    feed() returns every element that was completed by the new text.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._container_depth = None
+        self._in_string = False
+        self._escape = False
+        self._buffer = None
+
+    def feed(self, text):
+        elements = []
+        for char in text:
+            if self._buffer is not None:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '[{':
+                self._depth += 1
+                if self._container_depth is None:
+                    if char == '[':
+                        self._container_depth = self._depth
+                elif self._buffer is None and self._depth == self._container_depth + 1:
+                    self._buffer = [char]
+            elif char in ']}':
+                if self._buffer is not None and self._depth == self._container_depth + 1:
+                    element = self._parse(''.join(self._buffer))
+                    if element is not None:
+                        elements.append(element)
+                    self._buffer = None
+                self._depth -= 1
+        return elements
+
+    def _parse(self, text):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                return json.loads(fix_json(text))
+            except json.JSONDecodeError as e:
+                print("Skipping unparsable streamed segment:", text, str(e))
+                return None
+
+def _normalizeSegment(element):
+    """Convert a parsed element to ((t1, t2), keywords), or None if it is malformed"""
+    try:
+        if isinstance(element, dict):
+            t1, t2, keywords = element["start"], element["end"], element["keywords"]
+        else:
+            (t1, t2), keywords = element
+        return (float(t1), float(t2)), [str(keyword) for keyword in keywords]
+    except (KeyError, TypeError, ValueError):
+        print("Skipping malformed streamed segment:", element)
+        return None
+
+def stream_OpenAI(script, captions_timed):
+    """Yield the keyword response text as it is generated, using schema-constrained output"""
+    user_content = """Script: {}
+Timed Captions:{}
+""".format(script,"".join(map(str,captions_timed)))
+    messages = [
+        {"role": "system", "content": prompt + stream_prompt_suffix},
+        {"role": "user", "content": user_content}
+    ]
+
+    client, model = get_llm_client()
+    count("llm_prompt_chars", len(messages[0]["content"]) + len(user_content), call="keywords_stream")
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            temperature=1,
+            messages=messages,
+            stream=True,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "video_segments", "strict": True, "schema": SEGMENTS_SCHEMA}
+            }
+        )
+    except Exception as e:
+        # Not every model supports json_schema; plain JSON mode still streams
+        print("Structured output not available, falling back to JSON mode:", str(e))
+        response = client.chat.completions.create(
+            model=model,
+            temperature=1,
+            messages=messages,
+            stream=True,
+            response_format={"type": "json_object"}
+        )
+
+    text = []
+    first_token = None
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            text.append(delta)
+            yield delta
+    # Timed by hand: a span context would stay open across the yields above
+    add_span("llm.keywords_stream", start, time.perf_counter() - started, model=model, first_token_seconds=first_token)
+    log_response(LOG_TYPE_GPT,script,"".join(text))
+
+def iterVideoSearchQueriesTimed(script, captions_timed):
+    """Stream [[t1, t2], [keywords]] segments as soon as each one is complete.
+
+    Segments are made consecutive as they arrive and the last one is extended to
+    the end of the captions, since earlier segments may already be in use by the
+    consumer. Falls back to getVideoSearchQueriesTimed if streaming fails before
+    any segment was produced.
+    """
+    end = captions_timed[-1][0][1]
+    parser = SegmentStreamParser()
+    previous_end = 0
+    keywords = []
+    try:
+        for delta in stream_OpenAI(script, captions_timed):
+            for element in parser.feed(delta):
+                segment = _normalizeSegment(element)
+                if segment is None:
+                    continue
+                (_, t2), keywords = segment
+                t2 = min(t2, end)
+                if t2 <= previous_end:
+                    continue
+                yield [[previous_end, t2], keywords]
+                previous_end = t2
+    except Exception as e:
+        print("error in streamed response",e)
+
+    if previous_end == 0:
+        yield from getVideoSearchQueriesTimed(script, captions_timed) or []
+        return
+    if previous_end < end:
+        yield [[previous_end, end], keywords]
+
+# Longest background segment produced by mapKeywordsToCaptions before a
+# sentence is split at caption boundaries (matches the 3-5 second prompt above)
+MAX_SEGMENT_SECONDS = 5
+
+def _spoken_length(text):
+    """Number of letters and digits in text, used to align script and captions"""
+    return len(re.sub(r'[\W_]', '', text))
+
+def _splitCaptionRange(captions, keywords, max_seconds):
+    """Split a run of consecutive captions into segments of at most ~max_seconds"""
+    start = captions[0][0][0]
+    duration = captions[-1][0][1] - start
+    pieces = max(1, int(-(-duration // max_seconds)))
+    piece_duration = duration / pieces
+
+    segments = []
+    piece_start = start
+    for index, ((t1, t2), _) in enumerate(captions):
+        is_last = index == len(captions) - 1
+        if is_last or (t2 - piece_start >= piece_duration and len(segments) < pieces - 1):
+            # Rotate the keywords so each piece of a long sentence searches something different
+            shift = len(segments) % len(keywords) if keywords else 0
+            segments.append([[piece_start, t2], keywords[shift:] + keywords[:shift]])
+            piece_start = t2
+    return segments
+
+def mapKeywordsToCaptions(sentences, captions_timed, max_seconds=MAX_SEGMENT_SECONDS):
+    """Map per-sentence keywords onto the caption timeline without an LLM call.
+
+    sentences is the list returned by generate_script_with_keywords. Captions are
+    assigned to sentences by the share of the script's spoken characters they
+    cover, so small transcription differences (numbers, punctuation) do not
+    break the alignment. Returns the same [[[t1, t2], [keywords]], ...] shape as
+    getVideoSearchQueriesTimed, consecutive and covering the whole video.
+    """
+    if not sentences or not captions_timed:
+        return None
+
+    sentence_lengths = [max(_spoken_length(sentence["text"]), 1) for sentence in sentences]
+    caption_lengths = [_spoken_length(text) for _, text in captions_timed]
+    scale = sum(caption_lengths) / sum(sentence_lengths)
+
+    out = []
+    position = 0
+    consumed = 0
+    sentence_end = 0
+    for index, sentence in enumerate(sentences):
+        sentence_end += sentence_lengths[index] * scale
+        is_last = index == len(sentences) - 1
+        first = position
+        # A caption belongs to the sentence that contains most of its characters
+        while position < len(captions_timed) and (
+                is_last or consumed + caption_lengths[position] / 2 <= sentence_end):
+            consumed += caption_lengths[position]
+            position += 1
+        if position == first:
+            continue
+        out.extend(_splitCaptionRange(captions_timed[first:position], sentence["keywords"], max_seconds))
+
+    return out
+
 def merge_empty_intervals(segments):
     merged = []
     i = 0
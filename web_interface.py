@@ -1,22 +1,38 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 import asyncio
 import tempfile
 import shutil
-from datetime import datetime
 import time
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Import utility functions
-from utility.script.script_generator import generate_script
+from utility.script.script_generator import generate_script, generate_script_with_keywords
 from utility.audio.audio_generator import generate_audio
 from utility.captions.timed_captions_generator import generate_timed_captions
 from utility.video.background_video_generator import generate_video_url
-from utility.render.render_engine import get_output_media
-from utility.video.video_search_query_generator import getVideoSearchQueriesTimed, merge_empty_intervals
+from utility.render.artifact_store import get_artifact_store, start_artifact_server
+from utility.render.render_engine import RENDER_OUTPUT, get_output_media, progressive_dir
+from utility.progress import stage
+from utility.tracing import start_metrics_server, start_trace
+from utility.video.video_search_query_generator import iterVideoSearchQueriesTimed, mapKeywordsToCaptions, merge_empty_intervals
+
+# Expose Prometheus-style counters when running as a long-lived server
+if os.getenv('METRICS_PORT'):
+    start_metrics_server(int(os.getenv('METRICS_PORT')))
+
+# Rendered videos are streamed to the browser from the artifact server (HTTP Range, so players can seek)
+try:
+    start_artifact_server()
+    ARTIFACTS_SERVED = True
+except OSError as e:
+    print(f"⚠️  Could not start the artifact server: {e}")
+    ARTIFACTS_SERVED = False
 
 # Configure Streamlit page
 st.set_page_config(
@@ -33,6 +49,8 @@ if 'generating' not in st.session_state:
     st.session_state.generating = False
 if 'video_path' not in st.session_state:
     st.session_state.video_path = None
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
 if 'current_status' not in st.session_state:
     st.session_state.current_status = "Ready to generate video!"
 if 'generated_script' not in st.session_state:
@@ -100,75 +118,176 @@ def update_progress_bar(progress_bar, progress, status_text):
     progress_bar.progress(progress)
     st.session_state.current_status = status_text
 
-def generate_video_pipeline(topic, progress_bar):
+# Share of the progress bar covered by each stage's own progress events
+STAGE_PROGRESS = {
+    "footage": (0.75, 0.85),
+    "download": (0.85, 0.90),
+    "render": (0.90, 1.0),
+}
+
+def make_progress_sink(progress_bar):
+    """Event sink that drives the progress bar and shows stage messages and timings"""
+    def on_event(event):
+        if event["kind"] == "progress":
+            if event.get("progress") is None or event["stage"] not in STAGE_PROGRESS:
+                return
+            low, high = STAGE_PROGRESS[event["stage"]]
+            text = event["message"] or event["stage"]
+            if event.get("eta") is not None:
+                text += f" — about {event['eta']:.0f}s left"
+            progress_bar.progress(min(low + (high - low) * event["progress"], 1.0), text=text)
+        elif event["kind"] == "end":
+            st.caption(f"⏱️ {event['stage']} took {event['elapsed']:.1f}s")
+        elif event["message"]:
+            if event["level"] == "warning":
+                st.warning(event["message"])
+            else:
+                st.info(event["message"])
+    return on_event
+
+# Polls a progressive render's manifest.json and plays its HLS playlist (hls.js, or native HLS in Safari)
+PROGRESSIVE_PLAYER = """
+<video id="preview" controls muted autoplay playsinline style="width:100%;max-height:420px;background:#000"></video>
+<script src="https://cdn.jsdelivr.net/npm/hls.js@1"></script>
+<script>
+const manifestUrl = "MANIFEST_URL";
+const video = document.getElementById("preview");
+async function attach() {
+  const manifest = await fetch(manifestUrl, {cache: "no-store"}).then(r => r.ok ? r.json() : null).catch(() => null);
+  const playlist = manifest && new URL(manifest.playlist, manifestUrl).href;
+  const ready = playlist && await fetch(playlist, {method: "HEAD", cache: "no-store"}).then(r => r.ok).catch(() => false);
+  if (!ready) {
+    if (!manifest || manifest.status === "rendering") setTimeout(attach, 1000);
+    return;
+  }
+  if (video.canPlayType("application/vnd.apple.mpegurl")) {
+    video.src = playlist;
+  } else if (window.Hls && Hls.isSupported()) {
+    const hls = new Hls();
+    hls.loadSource(playlist);
+    hls.attachMedia(video);
+  }
+}
+attach();
+</script>
+"""
+
+def show_progressive_player(manifest_url):
+    """Embed a player that starts as soon as the first segments of a progressive render exist"""
+    components.html(PROGRESSIVE_PLAYER.replace("MANIFEST_URL", manifest_url), height=440)
+
+def collect_segments(segments, collected):
+    """Pass streamed search segments through while recording them in collected"""
+    for segment in segments:
+        collected.append(segment)
+        yield segment
+
+def generate_video_pipeline(topic, progress_bar, single_call=False):
     """Main video generation pipeline with progress tracking"""
 
     # Constants
-    SAMPLE_FILE_NAME = "audio_tts.wav"
+    VIDEO_FILE_NAME = "video.mp4"
     VIDEO_SERVER = "pexel"
 
+    # Sessions caption concurrently through the shared caption service, so each job narrates into its own file
+    audio_fd, audio_file = tempfile.mkstemp(prefix="audio_tts_", suffix=".wav")
+    os.close(audio_fd)
+
     st.info(f"🎬 Starting video generation pipeline for: '{topic}'")
+    on_event = make_progress_sink(progress_bar)
 
+    trace = None
     try:
-        # Step 1: Generate script (15%)
-        update_progress_bar(progress_bar, 0.15, "📝 Generating script from topic...")
-        st.info("🤖 Calling AI to generate script...")
-        script = generate_script(topic)
-        st.session_state.generated_script = script
-        st.success(f"✅ Script generated successfully! ({len(script)} characters)")
-
-        # Step 2: Generate audio (30%)
-        update_progress_bar(progress_bar, 0.30, "🎙️ Converting text to speech...")
-        asyncio.run(generate_audio(script, SAMPLE_FILE_NAME))
-        st.success("✅ Audio generated successfully!")
-
-        # Step 3: Generate timed captions (45%)
-        update_progress_bar(progress_bar, 0.45, "⏱️ Generating timed captions...")
-        timed_captions = generate_timed_captions(SAMPLE_FILE_NAME)
-        st.session_state.timed_captions = timed_captions
-        st.success("✅ Captions generated successfully!")
-
-        # Step 4: Generate video search queries (60%)
-        update_progress_bar(progress_bar, 0.60, "🔍 Creating video search queries...")
-        search_terms = getVideoSearchQueriesTimed(script, timed_captions)
-        st.session_state.search_terms = search_terms
-
-        if search_terms is None:
-            st.warning("⚠️ Could not generate video search queries")
-            return None
-
-        st.success("✅ Search queries generated!")
-
-        # Step 5: Find background videos (75%)
-        update_progress_bar(progress_bar, 0.75, "🎥 Finding background videos...")
-        background_video_urls = generate_video_url(search_terms, VIDEO_SERVER)
-
-        if background_video_urls is None:
-            st.warning("⚠️ No background videos found")
-            return None
-
-        st.success(f"✅ Found {len(background_video_urls)} background video segments!")
-
-        # Step 6: Merge empty intervals (85%)
-        update_progress_bar(progress_bar, 0.85, "🔧 Processing video segments...")
-        background_video_urls = merge_empty_intervals(background_video_urls)
-
-        # Step 7: Render final video (100%)
-        update_progress_bar(progress_bar, 0.95, "🎬 Rendering final video...")
-        video_path = get_output_media(SAMPLE_FILE_NAME, timed_captions, background_video_urls, VIDEO_SERVER)
-
-        update_progress_bar(progress_bar, 1.0, "✅ Video generation complete!")
-        st.success("🎉 Video generated successfully!")
-
-        return video_path
+        with start_trace() as trace:
+            # Step 1: Generate script (15%)
+            update_progress_bar(progress_bar, 0.15, "📝 Generating script from topic...")
+            st.info("🤖 Calling AI to generate script...")
+            sentences = None
+            with stage(on_event, "script"):
+                if single_call:
+                    script, sentences = generate_script_with_keywords(topic)
+                else:
+                    script = generate_script(topic)
+            st.session_state.generated_script = script
+            st.success(f"✅ Script generated successfully! ({len(script)} characters)")
+
+            # Step 2: Generate audio (30%)
+            update_progress_bar(progress_bar, 0.30, "🎙️ Converting text to speech...")
+            with stage(on_event, "audio"):
+                asyncio.run(generate_audio(script, audio_file, on_event=on_event))
+            st.success("✅ Audio generated successfully!")
+
+            # Step 3: Generate timed captions (45%)
+            update_progress_bar(progress_bar, 0.45, "⏱️ Generating timed captions...")
+            with stage(on_event, "captions"):
+                timed_captions = generate_timed_captions(audio_file, on_event=on_event)
+            st.session_state.timed_captions = timed_captions
+            st.success("✅ Captions generated successfully!")
+
+            # Step 4: Generate video search queries (60%)
+            update_progress_bar(progress_bar, 0.60, "🔍 Creating video search queries...")
+            if sentences:
+                search_terms = mapKeywordsToCaptions(sentences, timed_captions)
+                timed_video_searches = search_terms
+            else:
+                # Segments are searched as they stream in; keep a copy for display
+                search_terms = []
+                timed_video_searches = collect_segments(iterVideoSearchQueriesTimed(script, timed_captions), search_terms)
+            st.session_state.search_terms = search_terms
+
+            if search_terms is None:
+                st.warning("⚠️ Could not generate video search queries")
+                return None
+
+            # Step 5: Find background videos (75%)
+            update_progress_bar(progress_bar, 0.75, "🎥 Finding background videos...")
+            with stage(on_event, "footage"):
+                background_video_urls = generate_video_url(timed_video_searches, VIDEO_SERVER, on_event=on_event)
+
+            if not search_terms:
+                st.warning("⚠️ Could not generate video search queries")
+                return None
+
+            st.success(f"✅ Search queries generated! ({len(search_terms)} segments)")
+
+            if background_video_urls is None:
+                st.warning("⚠️ No background videos found")
+                return None
+
+            st.success(f"✅ Found {len(background_video_urls)} background video segments!")
+
+            # Step 6: Merge empty intervals (85%)
+            update_progress_bar(progress_bar, 0.85, "🔧 Processing video segments...")
+            background_video_urls = merge_empty_intervals(background_video_urls)
+
+            # Step 7: Render final video (100%), advanced frame by frame by the encoder
+            update_progress_bar(progress_bar, 0.85, "🎬 Rendering final video...")
+            with stage(on_event, "render"):
+                # Each job renders into its own artifact folder, named after the trace; expired ones go first
+                get_artifact_store().cleanup()
+                output_file = get_artifact_store().path(trace.job_id, VIDEO_FILE_NAME)
+                if RENDER_OUTPUT == "hls" and ARTIFACTS_SERVED:
+                    st.caption("▶️ Preview — plays while the video is still rendering")
+                    show_progressive_player(get_artifact_store().url(
+                        trace.job_id, os.path.join(progressive_dir(output_file), "manifest.json")))
+                video_path = get_output_media(audio_file, timed_captions, background_video_urls, VIDEO_SERVER,
+                                              on_event=on_event, output_file=output_file)
+            st.session_state.job_id = trace.job_id
+
+            update_progress_bar(progress_bar, 1.0, "✅ Video generation complete!")
+            st.success("🎉 Video generated successfully!")
+
+            return video_path
 
     except Exception as e:
         st.error(f"❌ Error during video generation: {str(e)}")
         return None
     finally:
         # Clean up temporary audio file
-        if os.path.exists(SAMPLE_FILE_NAME):
-            os.remove(SAMPLE_FILE_NAME)
+        if os.path.exists(audio_file):
+            os.remove(audio_file)
+        if trace is not None:
+            st.caption(f"🧭 Pipeline trace saved to {trace.write()}")
 
 def main():
     """Main Streamlit application"""
@@ -191,6 +310,12 @@ def main():
         else:
             st.success("✅ All API keys configured!")
 
+        single_call = st.checkbox(
+            "⚡ Single-call script + keywords",
+            value=False,
+            help="Generate the script and search keywords in one AI call and match keywords to captions locally"
+        )
+
         st.markdown("---")
         st.markdown("### 📋 Instructions")
         st.markdown("""
@@ -283,7 +408,7 @@ def main():
 
         try:
             # Generate video
-            video_path = generate_video_pipeline(topic.strip(), progress_bar)
+            video_path = generate_video_pipeline(topic.strip(), progress_bar, single_call=single_call)
 
             if video_path:
                 st.session_state.video_path = video_path
@@ -316,16 +441,23 @@ def main():
         col1, col2 = st.columns([2, 1])
 
         with col1:
-            st.video(st.session_state.video_path)
-
-            # Download button
-            with open(st.session_state.video_path, 'rb') as video_file:
-                st.download_button(
-                    label="📥 Download Video",
-                    data=video_file.read(),
-                    file_name=f"text_to_video_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4",
-                    mime="video/mp4"
-                )
+            if ARTIFACTS_SERVED and st.session_state.job_id:
+                # The browser streams from the artifact server; nothing is read into this process
+                store = get_artifact_store()
+                st.video(store.url(st.session_state.job_id, st.session_state.video_path))
+                st.link_button("📥 Download Video",
+                               store.url(st.session_state.job_id, st.session_state.video_path, download=True))
+            else:
+                st.video(st.session_state.video_path)
+
+                # Download button
+                with open(st.session_state.video_path, 'rb') as video_file:
+                    st.download_button(
+                        label="📥 Download Video",
+                        data=video_file.read(),
+                        file_name=f"text_to_video_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4",
+                        mime="video/mp4"
+                    )
 
         with col2:
             st.header("📋 Generated Content")